@@ -1,8 +1,13 @@
+import re
 import awacs.sts
 from apidevices import androidregister
 from apidevices import authorizer
+from apidevices import monitoring
+from apidevices import stage
+from apidevices import table
+from deployment import artifacts, build, environment
 from troposphere import Template, Output, Export, Ref, Sub, GetAtt
-from troposphere import apigateway, awslambda, iam, dynamodb
+from troposphere import apigateway, awslambda, iam
 
 
 def lambda_invocation_arn(lambda_resource):
@@ -11,7 +16,7 @@ def lambda_invocation_arn(lambda_resource):
             "arn", "aws", "apigateway", "${AWS::Region}", "lambda",
             "path/2015-03-31/functions/${fn}/invocations"
         ]),
-        fn=GetAtt(lambda_resource, "Arn"))
+        fn=Ref(lambda_resource))
 
 
 def executeapi_arn(api_resource, path):
@@ -23,21 +28,82 @@ def executeapi_arn(api_resource, path):
         api=Ref(api_resource))
 
 
+def authorizer_cache(settings):
+    ttl = settings['ttl']
+    identity_sources = settings['identity_sources']
+
+    if not isinstance(ttl, int) or ttl < 0 or ttl > 3600:
+        raise ValueError('authorizer cache TTL must be between 0 and 3600 '
+                         'seconds, got ' + repr(ttl))
+
+    if not identity_sources:
+        raise ValueError('the authorizer needs at least one identity source '
+                         'to build the cache key from')
+
+    for source in identity_sources:
+        if not re.match(
+                r'^(method\.request\.(header|querystring)|stageVariables|context)\.[A-Za-z0-9_.-]+$',
+                source):
+            raise ValueError('unsupported authorizer identity source ' +
+                             repr(source))
+
+    return ttl, ','.join(identity_sources)
+
+
+# the artifacts are uploaded to root's bucket before the template is deployed,
+# which no import shows; pushnotifications follows from the topic imports
+dependencies = ['root']
+
+# the authorizer is part of stage.snapshot(), so a new TTL or identity source
+# replaces the v1 deployment instead of waiting for an unrelated API change
+authorizer_caching = environment.select(
+    dict(
+        default=dict(
+            ttl=300, identity_sources=['method.request.header.Attestation']),
+        development=dict(ttl=0)))
+
+authorizer_ttl, authorizer_identity_source = authorizer_cache(
+    authorizer_caching)
+
+devices_table_capacity = environment.select(
+    dict(
+        default=dict(
+            mode='on-demand',
+            read=dict(min=5, max=200, target=70),
+            write=dict(min=5, max=100, target=70),
+            ttl_days=90,
+            dax=None),
+        production=dict(mode='provisioned')))
+
+devices_api_stage = environment.select(
+    dict(
+        default=dict(
+            minimum_compression_size=1024,
+            metrics=True,
+            logging_level='OFF',
+            data_trace=False,
+            throttling=dict(rate=100, burst=200),
+            methods={'POST /android/register': dict(rate=20, burst=50)},
+            caching=dict(cluster_size='0.5', ttl=300, methods=[])),
+        production=dict(logging_level='ERROR')))
+
+devices_api_monitoring = environment.select(
+    dict(
+        default=dict(
+            tracing=True,
+            period=60,
+            evaluation_periods=5,
+            latency=dict(p50=1000, p99=5000),
+            errors=5,
+            client_errors=50,
+            throttles=1,
+            consumed_capacity=80,
+            alarm_subscriptions=[],
+            alarm_actions=[])))
+
 template = Template()
 
-devices_table = template.add_resource(
-    dynamodb.Table(
-        'DevicesTable',
-        TableName='Devices',
-        KeySchema=[
-            dynamodb.KeySchema(AttributeName='key', KeyType='HASH'),
-        ],
-        AttributeDefinitions=[
-            dynamodb.AttributeDefinition(
-                AttributeName='key', AttributeType='S'),
-        ],
-        BillingMode='PAY_PER_REQUEST',
-    ))
+devices_table = table.generate(template, devices_table_capacity)
 
 restapi = template.add_resource(
     apigateway.RestApi(
@@ -46,6 +112,10 @@ restapi = template.add_resource(
         Description='Devices API.',
         BinaryMediaTypes=['application/vnd.pasbox.octets']))
 
+if devices_api_stage['minimum_compression_size'] is not None:
+    restapi.MinimumCompressionSize = devices_api_stage[
+        'minimum_compression_size']
+
 authorizer_lambda = authorizer.generate(template)
 
 authorizer_credentials = template.add_resource(
@@ -72,9 +142,9 @@ devices_authorizer = template.add_resource(
         RestApiId=Ref(restapi),
         Name='DevicesApiAuthorizer',
         Type='REQUEST',
-        AuthorizerResultTtlInSeconds=0,
+        AuthorizerResultTtlInSeconds=authorizer_ttl,
         AuthorizerCredentials=GetAtt(authorizer_credentials, "Arn"),
-        IdentitySource="method.request.header.Attestation",
+        IdentitySource=authorizer_identity_source,
         AuthorizerUri=lambda_invocation_arn(authorizer_lambda)))
 
 android_resource = template.add_resource(
@@ -104,7 +174,8 @@ android_register_resource = template.add_resource(
         ParentId=Ref(android_resource),
         PathPart='register'))
 
-android_register_lambda = androidregister.generate(template)
+android_register_lambda = androidregister.generate(
+    template, registration_ttl_days=devices_table_capacity['ttl_days'])
 
 android_register_permission = template.add_resource(
     awslambda.Permission(
@@ -128,14 +199,17 @@ android_register_method = template.add_resource(
             Uri=lambda_invocation_arn(android_register_lambda),
         )))
 
+if 'OFF' != devices_api_stage['logging_level']:
+    stage.logging_role(template)
+
 deployment_v1 = template.add_resource(
     apigateway.Deployment(
-        'AndroidRestApiV1',
+        'AndroidRestApiV1' + stage.snapshot(template),
         DependsOn=[root_method, android_register_method],
         RestApiId=Ref(restapi),
         StageName='v1',
-        StageDescription=apigateway.StageDescription(
-            Description='Devices API version 1.')))
+        StageDescription=stage.description('Devices API version 1.',
+                                           devices_api_stage)))
 
 template.add_output(
     Output(
@@ -144,19 +218,19 @@ template.add_output(
         Value=Ref(restapi),
         Export=Export('DevicesApiId')))
 
+monitoring.generate(template, 'DevicesApi', devices_api_monitoring)
+
 
 def pre_deploy(args):
-    authorizer.pre_deploy(args)
-    androidregister.pre_deploy(args)
+    build.run(args,
+              [authorizer.component(args),
+               androidregister.component(args)])
+    androidregister.package(args)
 
 
 def deploy(args):
-    params = []
-
-    for param in authorizer.deploy(args):
-        params.append(param)
-
-    for param in androidregister.deploy(args):
-        params.append(param)
-
-    return params
+    return artifacts.deploy(args, [
+        authorizer.artifact(args),
+        androidregister.artifact(args),
+        androidregister.layer_artifact(args)
+    ])
@@ -1,13 +1,50 @@
 import awacs
 import awacs.sts
-import boto3
 import os.path
-import subprocess
-from troposphere import Parameter, Output, Export, Sub, Ref, GetAtt
+from apidevices import functions
+from deployment import artifacts, build, environment, exports, layers, slim
+from troposphere import Parameter, Output, Export, ImportValue, Sub, Ref, GetAtt
 from troposphere import awslambda, iam
 
 
-def generate(template):
+DISTRIBUTION = os.path.relpath(
+    os.path.join(os.path.dirname(__file__), "build", "distributions",
+                 "androidregister-1.0-SNAPSHOT.zip"))
+
+SLIMMED = os.path.relpath(
+    os.path.join(os.path.dirname(__file__), "build", "distributions",
+                 "androidregister-1.0-SNAPSHOT-slim.zip"))
+
+FUNCTION = os.path.relpath(
+    os.path.join(os.path.dirname(__file__), "build", "distributions",
+                 "androidregister-1.0-SNAPSHOT-function.zip"))
+
+LAYER = os.path.relpath(
+    os.path.join(os.path.dirname(__file__), "build", "distributions",
+                 "androidregister-1.0-SNAPSHOT-layer.zip"))
+
+# jars built from this repository change with the application code and stay
+# in the function, everything else goes into the dependency layer
+PROJECT_JARS = ['lib/common-*.jar']
+
+# only the async DynamoDB and SNS clients are used, which run on the netty
+# client, so the apache sync client and its dependencies never load
+slimming = slim.rules(
+    strip=slim.SIGNATURES + slim.DOCS + ['codegen-resources/*'],
+    drop=[
+        'lib/apache-client-*.jar', 'lib/httpclient-*.jar',
+        'lib/httpcore-*.jar', 'lib/commons-logging-*.jar',
+        'lib/commons-codec-*.jar'
+    ],
+    keep_signed=['lib/bcprov-*.jar', 'lib/bcpkix-*.jar'])
+
+concurrency = environment.select(
+    dict(
+        default=dict(reserved_concurrency=None, provisioned_concurrency=0),
+        production=dict(provisioned_concurrency=2)))
+
+
+def generate(template, registration_ttl_days=None):
     artifact_bucket = template.add_parameter(
         Parameter('AndroidregisterArtifactBucket', Type='String'))
 
@@ -17,6 +54,26 @@ def generate(template):
     artifact_version = template.add_parameter(
         Parameter('AndroidregisterArtifactVersion', Type='String'))
 
+    layer_bucket = template.add_parameter(
+        Parameter('AndroidregisterLayerArtifactBucket', Type='String'))
+
+    layer_name = template.add_parameter(
+        Parameter('AndroidregisterLayerArtifactName', Type='String'))
+
+    layer_version = template.add_parameter(
+        Parameter('AndroidregisterLayerArtifactVersion', Type='String'))
+
+    dependencies = template.add_resource(
+        awslambda.LayerVersion(
+            'AndroidRegisterDependencies',
+            LayerName='androidregister-dependencies',
+            Description='Third party jars of AndroidRegisterFn.',
+            CompatibleRuntimes=['java8'],
+            Content=awslambda.Content(
+                S3Bucket=Ref(layer_bucket),
+                S3Key=Ref(layer_name),
+                S3ObjectVersion=Ref(layer_version))))
+
     fnrole = template.add_resource(
         iam.Role(
             'AndroidRegisterFnRole',
@@ -46,13 +103,15 @@ def generate(template):
             Timeout=30,
             Handler='dev.pasbox.apidevices.androidregister.AndroidRegister',
             Role=GetAtt(fnrole, "Arn"),
+            Layers=[Ref(dependencies)],
             Environment=awslambda.Environment(
                 Variables=dict(
-                    SNS_TOPIC_ANDROID_DEVICES_ARN=Sub("arn:aws:sns:${AWS::Region}:${AWS::AccountId}:devices-android"),
+                    SNS_TOPIC_ANDROID_DEVICES_ARN=ImportValue('DevicesAndroidTopicArn'),
                     SNS_PLATFORM_APPLICATION_ANDROID_ARN=Sub(
                         'arn:aws:sns:${AWS::Region}:${AWS::AccountId}:app/GCM/pasbox-android'
                     ),
-                    ANDROID_APP_PACKAGE_NAME="me.stojan.pasbox")),
+                    ANDROID_APP_PACKAGE_NAME="me.stojan.pasbox",
+                    DEVICE_REGISTRATION_TTL_DAYS=str(registration_ttl_days or ''))),
             Code=awslambda.Code(
                 S3Bucket=Ref(artifact_bucket),
                 S3Key=Ref(artifact_name),
@@ -71,45 +130,52 @@ def generate(template):
             Export=Export('AndroidRegisterFnArn'),
             Value=GetAtt(lambdafn, "Arn")))
 
-    return lambdafn
+    return functions.publish(template, 'AndroidRegisterFn', lambdafn, artifact_version,
+                             concurrency, layer_version=layer_version)
+
+
+def component(_args):
+    path = os.path.join(os.path.relpath(os.path.dirname(__file__)), "..", "..")
+
+    return build.component(
+        'androidregister', path, [
+            "./gradlew apidevices:androidregister:build"
+        ], [
+            os.path.join(path, name) for name in [
+                "settings.gradle", "gradle.properties",
+                "gradle/wrapper/gradle-wrapper.properties",
+                "apidevices/settings.gradle",
+                "apidevices/common/build.gradle", "apidevices/common/src",
+                "apidevices/androidregister/build.gradle",
+                "apidevices/androidregister/src"
+            ]
+        ], [DISTRIBUTION])
+
+
+def package(_args):
+    slim.run('androidregister', DISTRIBUTION, SLIMMED, slimming)
+
+    return layers.split('androidregister', SLIMMED, FUNCTION, LAYER,
+                        PROJECT_JARS)
+
+
+def pre_deploy(args):
+    build.run(args, [component(args)])
+    package(args)
 
 
-def pre_deploy(_args):
-    for command in [
-        "./gradlew apidevices:androidregister:build"
-    ]:
-        path = os.path.join(os.path.relpath(os.path.dirname(__file__)), "..", "..")
-        print(">>> run '" + command + "' in '" + path + "'")
+def artifact(args):
+    return artifacts.artifact(
+        'Androidregister',
+        exports.bucket(args),
+        'apidevices-androidregister.zip', FUNCTION)
 
-        process = subprocess.Popen(command, cwd=path, shell=True)
-        process.wait()
 
-        if 0 != process.returncode:
-            exit(process.returncode)
+def layer_artifact(args):
+    return artifacts.artifact(
+        'AndroidregisterLayer', exports.bucket(args),
+        layers.key('apidevices-androidregister-layer', LAYER), LAYER)
 
 
 def deploy(args):
-    bucket = 'artifacts-' + args.region + '-' + args.account
-    key = 'apidevices-androidregister.zip'
-
-    s3_client = boto3.client('s3')
-
-    artifact = open(
-        os.path.relpath(
-            os.path.join(os.path.dirname(__file__), "build", "distributions", "androidregister-1.0-SNAPSHOT.zip")),
-        "rb")
-    artifact_object = s3_client.put_object(
-        Bucket=bucket, Key=key, Body=artifact)
-    artifact.close()
-
-    version = artifact_object['VersionId']
-
-    return [
-        dict(
-            ParameterKey='AndroidregisterArtifactBucket',
-            ParameterValue=bucket),
-        dict(ParameterKey='AndroidregisterArtifactName', ParameterValue=key),
-        dict(
-            ParameterKey='AndroidregisterArtifactVersion',
-            ParameterValue=version)
-    ]
+    return artifacts.deploy(args, [artifact(args), layer_artifact(args)])
@@ -185,6 +185,10 @@ class AndroidRegister(
                 "updatedAt" dynamo now
               )
 
+              Config.DEVICE_REGISTRATION_TTL?.let { ttl ->
+                assign("expiresAt" dynamo now.plus(ttl).epochSecond)
+              }
+
               ifNotExists("createdAt", "createdAt" dynamo now)
             }
 
@@ -206,6 +210,10 @@ class AndroidRegister(
                 "updatedAt" dynamo now
               )
 
+              Config.DEVICE_REGISTRATION_TTL?.let { ttl ->
+                assign("expiresAt" dynamo now.plus(ttl).epochSecond)
+              }
+
               ifNotExists("createdAt", "createdAt" dynamo now)
             }
 
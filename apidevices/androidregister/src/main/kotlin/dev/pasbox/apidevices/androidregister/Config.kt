@@ -1,6 +1,11 @@
 package dev.pasbox.apidevices.androidregister
 
+import java.time.Duration
+
 object Config {
   val SNS_TOPIC_ANDROID_ARN = System.getenv("SNS_TOPIC_ANDROID_ARN")!!
   val SNS_PLATFORM_APPLICATION_ANDROID_ARN = System.getenv("SNS_PLATFORM_APPLICATION_ANDROID_ARN")!!
+  val DEVICE_REGISTRATION_TTL: Duration? = System.getenv("DEVICE_REGISTRATION_TTL_DAYS")
+    ?.takeIf { it.isNotEmpty() }
+    ?.let { Duration.ofDays(it.toLong()) }
 }
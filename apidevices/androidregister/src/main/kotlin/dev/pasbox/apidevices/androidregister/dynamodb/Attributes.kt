@@ -25,6 +25,7 @@ inline fun Certificate?.toDynamo() = this.dynamoNullOr { it.b(SdkBytes.fromByteA
 inline fun List<Certificate?>?.toDynamo() = this.dynamoNullOr { it.l(this.map { dynamoNullOr { it } }) }
 
 inline infix fun String.dynamo(value: Int?) = Pair(this, value.toDynamo())
+inline infix fun String.dynamo(value: Long?) = Pair(this, value.toDynamo())
 inline infix fun String.dynamo(value: String?) = Pair(this, value.toDynamo())
 inline infix fun String.dynamo(value: ByteArray?) = Pair(this, value.toDynamo())
 inline infix fun String.dynamo(value: Instant?) = Pair(this, value.toDynamo())
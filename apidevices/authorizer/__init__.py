@@ -1,6 +1,7 @@
-import boto3
 import os.path
-import subprocess
+
+from apidevices import functions
+from deployment import artifacts, build, environment, exports
 
 import awacs
 import awacs.sts
@@ -9,6 +10,10 @@ from troposphere import Template, Parameter, Output, Export, Sub, Ref, GetAtt
 from troposphere import awslambda, iam
 
 
+concurrency = environment.select(
+    dict(default=dict(reserved_concurrency=None, provisioned_concurrency=0)))
+
+
 def generate(template):
     artifact_bucket = template.add_parameter(
         Parameter('AuthorizerArtifactBucket', Type='String'))
@@ -64,40 +69,33 @@ def generate(template):
             Export=Export('DeviceAuthorizerFnArn'),
             Value=GetAtt(lambdafn, "Arn")))
 
-    return lambdafn
-
+    return functions.publish(template, 'DeviceAuthorizerFn', lambdafn, artifact_version,
+                             concurrency)
 
-def pre_deploy(_args):
-    for command in [
-            "yarn install --pure-lockfile", "yarn build", "yarn artifact"
-    ]:
-        path = os.path.relpath(os.path.dirname(__file__))
-        print(">>> run '" + command + "' in '" + path + "'")
 
-        process = subprocess.Popen(command, cwd=path, shell=True)
-        process.wait()
+def component(_args):
+    path = os.path.relpath(os.path.dirname(__file__))
 
-        if 0 != process.returncode:
-            exit(process.returncode)
+    return build.component(
+        'authorizer', path,
+        ["yarn install --pure-lockfile", "yarn build", "yarn artifact"], [
+            os.path.join(path, name) for name in
+            ["index.ts", "package.json", "tsconfig.json", "yarn.lock"]
+        ], [os.path.join(path, "artifact.zip")])
 
 
-def deploy(args):
-    bucket = 'artifacts-' + args.region + '-' + args.account
-    key = 'apidevices-authorizer.zip'
+def pre_deploy(args):
+    build.run(args, [component(args)])
 
-    s3_client = boto3.client('s3')
 
-    artifact = open(
+def artifact(args):
+    return artifacts.artifact(
+        'Authorizer',
+        exports.bucket(args),
+        'apidevices-authorizer.zip',
         os.path.relpath(
-            os.path.join(os.path.dirname(__file__), "artifact.zip")), "rb")
-    artifact_object = s3_client.put_object(
-        Bucket=bucket, Key=key, Body=artifact)
-    artifact.close()
-
-    version = artifact_object['VersionId']
-
-    return [
-        dict(ParameterKey='AuthorizerArtifactBucket', ParameterValue=bucket),
-        dict(ParameterKey='AuthorizerArtifactName', ParameterValue=key),
-        dict(ParameterKey='AuthorizerArtifactVersion', ParameterValue=version)
-    ]
+            os.path.join(os.path.dirname(__file__), "artifact.zip")))
+
+
+def deploy(args):
+    return artifacts.deploy(args, [artifact(args)])
@@ -0,0 +1,84 @@
+import hashlib
+import json
+
+from troposphere import AWSHelperFn, Output, Export, Ref, Sub, GetAtt
+from troposphere import awslambda
+
+
+class Configuration(AWSHelperFn):
+    # hashed when the template is serialized so properties added to the
+    # function after it was published still replace the version
+    def __init__(self, lambdafn, artifact_version, layer_version=None):
+        self.lambdafn = lambdafn
+        self.artifact_version = artifact_version
+        self.layer_version = layer_version
+
+    def to_dict(self):
+        configuration = hashlib.sha256(
+            json.dumps(self.lambdafn.to_dict(), sort_keys=True).encode(
+                'utf-8')).hexdigest()[:16]
+
+        if self.layer_version is None:
+            return Sub(
+                'artifact ${version}, configuration ' + configuration,
+                version=Ref(self.artifact_version)).to_dict()
+
+        # layers are referenced by an ARN that only changes on deploy, their
+        # artifact version is what tells a new dependency set apart
+        return Sub(
+            'artifact ${version}, layer ${layer}, configuration ' +
+            configuration,
+            version=Ref(self.artifact_version),
+            layer=Ref(self.layer_version)).to_dict()
+
+
+def concurrency(settings):
+    reserved = settings.get('reserved_concurrency')
+    provisioned = settings.get('provisioned_concurrency', 0)
+
+    if reserved is not None and (not isinstance(reserved, int) or reserved < 0):
+        raise ValueError('reserved concurrency must be a non-negative integer, '
+                         'got ' + repr(reserved))
+
+    if not isinstance(provisioned, int) or provisioned < 0:
+        raise ValueError('provisioned concurrency must be a non-negative '
+                         'integer, got ' + repr(provisioned))
+
+    if reserved is not None and provisioned > reserved:
+        raise ValueError('provisioned concurrency ({}) can not exceed reserved '
+                         'concurrency ({})'.format(provisioned, reserved))
+
+    return reserved, provisioned
+
+
+def publish(template, name, lambdafn, artifact_version, settings,
+            layer_version=None):
+    reserved, provisioned = concurrency(settings)
+
+    if reserved is not None:
+        lambdafn.ReservedConcurrentExecutions = reserved
+
+    version = template.add_resource(
+        awslambda.Version(
+            name + 'Version',
+            FunctionName=Ref(lambdafn),
+            Description=Configuration(lambdafn, artifact_version,
+                                      layer_version)))
+
+    alias = awslambda.Alias(
+        name + 'LiveAlias',
+        Name='live',
+        FunctionName=Ref(lambdafn),
+        FunctionVersion=GetAtt(version, "Version"))
+
+    if provisioned > 0:
+        alias.ProvisionedConcurrencyConfig = awslambda.ProvisionedConcurrencyConfiguration(
+            ProvisionedConcurrentExecutions=provisioned)
+
+    template.add_resource(alias)
+
+    template.add_output(
+        Output(name + 'LiveArn', Export=Export(name + 'LiveArn'),
+               Value=Ref(alias)))
+
+    return alias
@@ -0,0 +1,380 @@
+import json
+import re
+
+from troposphere import Output, Export, Ref, Sub
+from troposphere import apigateway, awslambda, cloudwatch, dynamodb, iam, sns
+from troposphere import applicationautoscaling
+
+XRAY_POLICY = "arn:aws:iam::aws:policy/AWSXRayDaemonWriteAccess"
+
+# DynamoDB's default per table limit for on-demand tables
+ON_DEMAND_CAPACITY = 40000
+
+PERCENTILES = ['p50', 'p99']
+
+SUBSCRIPTION_PROTOCOLS = ['email', 'https', 'sms', 'sqs', 'lambda']
+
+
+def resources(template, kind):
+    return [
+        resource for resource in template.resources.values()
+        if isinstance(resource, kind)
+    ]
+
+
+def referenced(value):
+    data = getattr(value, 'data', {})
+
+    if 'Ref' in data:
+        return data['Ref']
+
+    if 'Fn::GetAtt' in data:
+        return data['Fn::GetAtt'][0]
+
+    return None
+
+
+def validate(settings):
+    for percentile in PERCENTILES:
+        if settings['latency'][percentile] <= 0:
+            raise ValueError(percentile + ' latency threshold must be '
+                             'positive, got ' +
+                             repr(settings['latency'][percentile]))
+
+    if settings['consumed_capacity'] <= 0 or \
+            settings['consumed_capacity'] > 100:
+        raise ValueError('consumed capacity threshold must be a percentage, '
+                         'got ' + repr(settings['consumed_capacity']))
+
+    if settings['period'] % 60:
+        raise ValueError('alarm period must be a multiple of 60 seconds, got ' +
+                         repr(settings['period']))
+
+    for subscription in settings['alarm_subscriptions']:
+        if subscription['protocol'] not in SUBSCRIPTION_PROTOCOLS:
+            raise ValueError('unknown alarm subscription protocol ' +
+                             repr(subscription['protocol']) +
+                             ', expected one of ' +
+                             ', '.join(SUBSCRIPTION_PROTOCOLS))
+
+
+def alarm_topic(template, name, settings):
+    properties = dict(
+        TopicName=re.sub('(?<!^)(?=[A-Z])', '-', name).lower() + '-alarms')
+
+    if settings['alarm_subscriptions']:
+        properties['Subscription'] = [
+            sns.Subscription(
+                Protocol=subscription['protocol'],
+                Endpoint=subscription['endpoint'])
+            for subscription in settings['alarm_subscriptions']
+        ]
+
+    topic = template.add_resource(
+        sns.Topic(name + 'AlarmTopic', **properties))
+
+    template.add_output(
+        Output(
+            name + 'AlarmTopicArn',
+            Description='Topic the ' + name + ' alarms notify.',
+            Value=Ref(topic),
+            Export=Export(name + 'AlarmTopicArn')))
+
+    return topic
+
+
+def alarm(template, name, description, settings, **properties):
+    properties.setdefault('ComparisonOperator', 'GreaterThanThreshold')
+    properties.setdefault('TreatMissingData', 'notBreaching')
+
+    return template.add_resource(
+        cloudwatch.Alarm(
+            name,
+            AlarmDescription=description,
+            Period=settings['period'],
+            EvaluationPeriods=settings['evaluation_periods'],
+            AlarmActions=settings['alarm_actions'],
+            OKActions=settings['alarm_actions'],
+            **properties))
+
+
+def trace_functions(template):
+    for function in resources(template, awslambda.Function):
+        function.TracingConfig = awslambda.TracingConfig(Mode='Active')
+
+        role = template.resources.get(referenced(function.Role))
+
+        if isinstance(role, iam.Role) and \
+                XRAY_POLICY not in role.properties.get('ManagedPolicyArns', []):
+            role.ManagedPolicyArns = role.properties.get(
+                'ManagedPolicyArns', []) + [XRAY_POLICY]
+
+
+def trace_stages(template):
+    for deployment in resources(template, apigateway.Deployment):
+        if 'StageDescription' in deployment.properties:
+            deployment.StageDescription.TracingEnabled = True
+
+    for stage in resources(template, apigateway.Stage):
+        stage.TracingEnabled = True
+
+
+def function_alarms(template, function, settings):
+    name = function.title
+    dimensions = [
+        cloudwatch.MetricDimension(Name='FunctionName', Value=Ref(function))
+    ]
+
+    for percentile in PERCENTILES:
+        alarm(
+            template,
+            name + percentile.upper() + 'DurationAlarm',
+            name + ' ' + percentile + ' duration is over ' +
+            str(settings['latency'][percentile]) + 'ms.',
+            settings,
+            Namespace='AWS/Lambda',
+            MetricName='Duration',
+            Dimensions=dimensions,
+            ExtendedStatistic=percentile,
+            Threshold=float(settings['latency'][percentile]))
+
+    for metric, threshold in [('Errors', settings['errors']),
+                              ('Throttles', settings['throttles'])]:
+        alarm(
+            template,
+            name + metric + 'Alarm',
+            name + ' ' + metric.lower() + ' are at or over ' +
+            str(threshold) + '.',
+            settings,
+            Namespace='AWS/Lambda',
+            MetricName=metric,
+            Dimensions=dimensions,
+            Statistic='Sum',
+            ComparisonOperator='GreaterThanOrEqualToThreshold',
+            Threshold=float(threshold))
+
+
+def resource_paths(template):
+    paths = dict()
+    pending = resources(template, apigateway.Resource)
+
+    while pending:
+        remaining = []
+
+        for resource in pending:
+            parent = referenced(resource.ParentId)
+
+            if 'Fn::GetAtt' in resource.ParentId.data:
+                paths[resource.title] = '/' + resource.PathPart
+            elif parent in paths:
+                paths[resource.title] = paths[parent] + '/' + resource.PathPart
+            else:
+                remaining.append(resource)
+
+        if len(remaining) == len(pending):
+            raise ValueError('API resources without a known parent: ' +
+                             ', '.join(item.title for item in remaining))
+
+        pending = remaining
+
+    return paths
+
+
+def methods(template):
+    paths = resource_paths(template)
+    apis = dict((api.title, api) for api in resources(template,
+                                                      apigateway.RestApi))
+    stages = dict()
+
+    for deployment in resources(template, apigateway.Deployment):
+        if 'StageName' in deployment.properties:
+            stages.setdefault(referenced(deployment.RestApiId),
+                              []).append(deployment.StageName)
+
+    for method in resources(template, apigateway.Method):
+        api = apis[referenced(method.RestApiId)]
+        path = paths.get(referenced(method.ResourceId), '/')
+
+        for stage_name in stages.get(api.title, []):
+            yield method, api.Name, stage_name, path
+
+
+def method_alarms(template, method, api_name, stage_name, path, settings):
+    name = method.title
+    route = method.HttpMethod + ' ' + path
+    dimensions = [
+        cloudwatch.MetricDimension(Name='ApiName', Value=api_name),
+        cloudwatch.MetricDimension(Name='Method', Value=method.HttpMethod),
+        cloudwatch.MetricDimension(Name='Resource', Value=path),
+        cloudwatch.MetricDimension(Name='Stage', Value=stage_name),
+    ]
+
+    for percentile in PERCENTILES:
+        alarm(
+            template,
+            name + percentile.upper() + 'LatencyAlarm',
+            route + ' ' + percentile + ' latency is over ' +
+            str(settings['latency'][percentile]) + 'ms.',
+            settings,
+            Namespace='AWS/ApiGateway',
+            MetricName='Latency',
+            Dimensions=dimensions,
+            ExtendedStatistic=percentile,
+            Threshold=float(settings['latency'][percentile]))
+
+    # API Gateway answers throttled requests with 429, counted as 4XXError
+    for metric, label, threshold in [
+        ('5XXError', 'Errors', settings['errors']),
+        ('4XXError', 'ClientErrors', settings['client_errors']),
+    ]:
+        alarm(
+            template,
+            name + label + 'Alarm',
+            route + ' ' + metric + ' responses are at or over ' +
+            str(threshold) + '.',
+            settings,
+            Namespace='AWS/ApiGateway',
+            MetricName=metric,
+            Dimensions=dimensions,
+            Statistic='Sum',
+            ComparisonOperator='GreaterThanOrEqualToThreshold',
+            Threshold=float(threshold))
+
+
+def table_capacity(template, table, dimension):
+    for target in resources(template, applicationautoscaling.ScalableTarget):
+        if target.ScalableDimension == 'dynamodb:table:' + dimension + \
+                'CapacityUnits' and table.title in json.dumps(
+                    target.ResourceId.to_dict()):
+            return target.MaxCapacity
+
+    throughput = table.properties.get('ProvisionedThroughput')
+
+    if throughput is not None:
+        return getattr(throughput, dimension + 'CapacityUnits')
+
+    return ON_DEMAND_CAPACITY
+
+
+def table_alarms(template, table, settings):
+    name = table.title
+    dimensions = [
+        cloudwatch.MetricDimension(Name='TableName', Value=Ref(table))
+    ]
+
+    for dimension in ['Read', 'Write']:
+        capacity = table_capacity(template, table, dimension)
+        threshold = capacity * settings['consumed_capacity'] / 100.0
+
+        alarm(
+            template,
+            name + dimension + 'CapacityAlarm',
+            name + ' consumes over ' + str(settings['consumed_capacity']) +
+            '% of its ' + str(capacity) + ' ' + dimension.lower() +
+            ' capacity units.',
+            settings,
+            Namespace='AWS/DynamoDB',
+            MetricName='Consumed' + dimension + 'CapacityUnits',
+            Dimensions=dimensions,
+            Statistic='Sum',
+            Threshold=threshold * settings['period'])
+
+        alarm(
+            template,
+            name + dimension + 'ThrottleAlarm',
+            name + ' ' + dimension.lower() + ' requests are being throttled.',
+            settings,
+            Namespace='AWS/DynamoDB',
+            MetricName=dimension + 'ThrottleEvents',
+            Dimensions=dimensions,
+            Statistic='Sum',
+            ComparisonOperator='GreaterThanOrEqualToThreshold',
+            Threshold=float(settings['throttles']))
+
+
+def widget(title, metrics, stat, x, y):
+    return dict(
+        type='metric',
+        x=x,
+        y=y,
+        width=12,
+        height=6,
+        properties=dict(
+            title=title,
+            region='${AWS::Region}',
+            stat=stat,
+            period=60,
+            view='timeSeries',
+            metrics=metrics))
+
+
+def dashboard(template, name, settings):
+    widgets = []
+    y = 0
+
+    functions = resources(template, awslambda.Function)
+    api_methods = list(methods(template))
+    tables = resources(template, dynamodb.Table)
+
+    for x, percentile in zip([0, 12], PERCENTILES):
+        widgets.append(
+            widget('Function duration ' + percentile, [[
+                'AWS/Lambda', 'Duration', 'FunctionName',
+                '${' + function.title + '}'
+            ] for function in functions], percentile, x, y))
+    y += 6
+
+    widgets.append(
+        widget('Function errors and throttles', [[
+            'AWS/Lambda', metric, 'FunctionName', '${' + function.title + '}'
+        ] for function in functions for metric in ['Errors', 'Throttles']],
+               'Sum', 0, y))
+    y += 6
+
+    for x, percentile in zip([0, 12], PERCENTILES):
+        widgets.append(
+            widget('API latency ' + percentile, [[
+                'AWS/ApiGateway', 'Latency', 'ApiName', api_name, 'Method',
+                method.HttpMethod, 'Resource', path, 'Stage', stage_name
+            ] for method, api_name, stage_name, path in api_methods],
+                   percentile, x, y))
+    y += 6
+
+    widgets.append(
+        widget('Table consumed capacity and throttles', [[
+            'AWS/DynamoDB', metric, 'TableName', '${' + table.title + '}'
+        ] for table in tables for metric in [
+            'ConsumedReadCapacityUnits', 'ConsumedWriteCapacityUnits',
+            'ReadThrottleEvents', 'WriteThrottleEvents'
+        ]], 'Sum', 0, y))
+
+    return template.add_resource(
+        cloudwatch.Dashboard(
+            name + 'Dashboard',
+            DashboardName=name,
+            DashboardBody=Sub(
+                json.dumps(dict(widgets=widgets), separators=(',', ':')))))
+
+
+def generate(template, name, settings):
+    validate(settings)
+
+    # every alarm notifies the topic, alarm_actions only adds to it
+    topic = alarm_topic(template, name, settings)
+    settings = dict(settings,
+                    alarm_actions=[Ref(topic)] + settings['alarm_actions'])
+
+    if settings['tracing']:
+        trace_functions(template)
+        trace_stages(template)
+
+    for function in resources(template, awslambda.Function):
+        function_alarms(template, function, settings)
+
+    for method, api_name, stage_name, path in list(methods(template)):
+        method_alarms(template, method, api_name, stage_name, path, settings)
+
+    for table in resources(template, dynamodb.Table):
+        table_alarms(template, table, settings)
+
+    return dashboard(template, name, settings)
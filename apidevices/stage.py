@@ -0,0 +1,136 @@
+import hashlib
+import json
+
+from troposphere import Output, ImportValue
+from troposphere import apigateway
+
+LOGGING_LEVELS = ['OFF', 'ERROR', 'INFO']
+
+CACHE_CLUSTER_SIZES = ['0.5', '1.6', '6.1', '13.5', '28.4', '58.2', '118',
+                       '237']
+
+SAFE_METHODS = ['GET', 'HEAD', 'OPTIONS']
+
+# what a stage serves is a snapshot of these, taken by a deployment
+SNAPSHOT_TYPES = (apigateway.RestApi, apigateway.Resource, apigateway.Method,
+                  apigateway.Authorizer, apigateway.Model,
+                  apigateway.RequestValidator, apigateway.GatewayResponse)
+
+
+def route(key):
+    method, path = key.split(' ', 1)
+
+    if '/' == path or '/*' == path:
+        return method, path
+
+    return method, '/~1' + path.strip('/').replace('/', '~1')
+
+
+def validate_throttling(name, throttling):
+    if throttling['rate'] <= 0 or throttling['burst'] <= 0:
+        raise ValueError(name + ' throttling limits must be positive, got ' +
+                         repr(throttling))
+
+    if throttling['burst'] < throttling['rate']:
+        raise ValueError(name + ' burst limit can not be lower than the rate '
+                         'limit, got ' + repr(throttling))
+
+
+def validate(settings):
+    size = settings['minimum_compression_size']
+
+    if size is not None and (size < 0 or size > 10485760):
+        raise ValueError('minimum compression size must be between 0 and '
+                         '10485760 bytes, got ' + repr(size))
+
+    if settings['logging_level'] not in LOGGING_LEVELS:
+        raise ValueError('unknown logging level ' +
+                         repr(settings['logging_level']) +
+                         ', expected one of ' + ', '.join(LOGGING_LEVELS))
+
+    validate_throttling('stage', settings['throttling'])
+
+    for key, throttling in settings['methods'].items():
+        validate_throttling(key, throttling)
+
+    caching = settings['caching']
+
+    if caching['methods']:
+        if caching['cluster_size'] not in CACHE_CLUSTER_SIZES:
+            raise ValueError('unknown cache cluster size ' +
+                             repr(caching['cluster_size']))
+
+        if caching['ttl'] < 0 or caching['ttl'] > 3600:
+            raise ValueError('cache TTL must be between 0 and 3600 seconds, '
+                             'got ' + repr(caching['ttl']))
+
+    for key in caching['methods']:
+        if route(key)[0] not in SAFE_METHODS:
+            raise ValueError('only ' + ', '.join(SAFE_METHODS) +
+                             ' routes can be cached, got ' + repr(key))
+
+
+def logging_role(template):
+    # execution logs need the account wide CloudWatch role the root stack
+    # sets up, importing it fails the deploy early in accounts without it
+    template.add_output(
+        Output(
+            'DevicesApiCloudWatchRoleArn',
+            Description='Role API Gateway writes the execution logs with.',
+            Value=ImportValue('ApiGatewayCloudWatchRoleArn')))
+
+
+def snapshot(template):
+    # changed methods, integrations and authorizers only reach a stage through
+    # a new deployment, a logical ID derived from them replaces the deployment
+    # whenever they change
+    resources = dict((resource.title, resource.to_dict())
+                     for resource in template.resources.values()
+                     if isinstance(resource, SNAPSHOT_TYPES))
+
+    return hashlib.sha256(
+        json.dumps(resources, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def description(text, settings):
+    validate(settings)
+
+    caching = settings['caching']
+    method_settings = []
+
+    for key in sorted(set(settings['methods']) | set(caching['methods'])):
+        method, path = route(key)
+        properties = dict(
+            HttpMethod=method,
+            ResourcePath=path,
+            MetricsEnabled=settings['metrics'],
+            LoggingLevel=settings['logging_level'],
+            DataTraceEnabled=settings['data_trace'])
+
+        if key in settings['methods']:
+            properties['ThrottlingRateLimit'] = float(
+                settings['methods'][key]['rate'])
+            properties['ThrottlingBurstLimit'] = settings['methods'][key][
+                'burst']
+
+        if key in caching['methods']:
+            properties['CachingEnabled'] = True
+            properties['CacheTtlInSeconds'] = caching['ttl']
+            properties['CacheDataEncrypted'] = True
+
+        method_settings.append(apigateway.MethodSetting(**properties))
+
+    properties = dict(
+        Description=text,
+        MetricsEnabled=settings['metrics'],
+        LoggingLevel=settings['logging_level'],
+        DataTraceEnabled=settings['data_trace'],
+        ThrottlingRateLimit=float(settings['throttling']['rate']),
+        ThrottlingBurstLimit=settings['throttling']['burst'],
+        MethodSettings=method_settings)
+
+    if caching['methods']:
+        properties['CacheClusterEnabled'] = True
+        properties['CacheClusterSize'] = caching['cluster_size']
+
+    return apigateway.StageDescription(**properties)
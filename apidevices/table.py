@@ -0,0 +1,170 @@
+import awacs
+import awacs.dynamodb
+import awacs.sts
+
+from troposphere import Output, Export, Ref, Sub, GetAtt
+from troposphere import applicationautoscaling, dax, dynamodb, iam
+
+TTL_ATTRIBUTE = 'expiresAt'
+
+MODES = ['on-demand', 'provisioned']
+
+DAX_SETTINGS = ['node_type', 'nodes', 'subnets', 'security_groups']
+
+
+def validate(settings):
+    if settings['mode'] not in MODES:
+        raise ValueError('unknown Devices table capacity mode ' +
+                         repr(settings['mode']) + ', expected one of ' +
+                         ', '.join(MODES))
+
+    if 'provisioned' == settings['mode']:
+        for dimension in ['read', 'write']:
+            capacity = settings[dimension]
+
+            if capacity['min'] < 1 or capacity['min'] > capacity['max']:
+                raise ValueError(dimension + ' capacity needs 1 <= min <= max, '
+                                 'got ' + repr(capacity))
+
+            if capacity['target'] < 20 or capacity['target'] > 90:
+                raise ValueError(dimension + ' target utilization must be '
+                                 'between 20 and 90 percent, got ' +
+                                 repr(capacity['target']))
+
+    if settings['ttl_days'] is not None and settings['ttl_days'] < 1:
+        raise ValueError('registrations must live at least one day, got ' +
+                         repr(settings['ttl_days']))
+
+    if settings['dax']:
+        missing = [key for key in DAX_SETTINGS if key not in settings['dax']]
+
+        if missing:
+            raise ValueError('the DAX cluster settings lack ' +
+                             ', '.join(missing))
+
+        if not settings['dax']['subnets']:
+            raise ValueError('the DAX cluster needs at least one subnet')
+
+        if settings['dax']['nodes'] < 1 or settings['dax']['nodes'] > 10:
+            raise ValueError('the DAX cluster needs 1 to 10 nodes, got ' +
+                             repr(settings['dax']['nodes']))
+
+
+def autoscaling(template, table, dimension, capacity):
+    name = dimension.capitalize()
+
+    # without a RoleARN Application Auto Scaling creates its service linked
+    # role in accounts that don't have it yet
+    target = template.add_resource(
+        applicationautoscaling.ScalableTarget(
+            'DevicesTable' + name + 'ScalableTarget',
+            ServiceNamespace='dynamodb',
+            ResourceId=Sub('table/${table}', table=Ref(table)),
+            ScalableDimension='dynamodb:table:' + name + 'CapacityUnits',
+            MinCapacity=capacity['min'],
+            MaxCapacity=capacity['max']))
+
+    template.add_resource(
+        applicationautoscaling.ScalingPolicy(
+            'DevicesTable' + name + 'ScalingPolicy',
+            PolicyName='DevicesTable' + name + 'ScalingPolicy',
+            PolicyType='TargetTrackingScaling',
+            ScalingTargetId=Ref(target),
+            TargetTrackingScalingPolicyConfiguration=applicationautoscaling.
+            TargetTrackingScalingPolicyConfiguration(
+                TargetValue=float(capacity['target']),
+                PredefinedMetricSpecification=applicationautoscaling.
+                PredefinedMetricSpecification(
+                    PredefinedMetricType='DynamoDB' + name +
+                    'CapacityUtilization'))))
+
+
+def accelerator(template, table, settings):
+    role = template.add_resource(
+        iam.Role(
+            'DevicesDaxRole',
+            RoleName='DevicesDaxRole',
+            AssumeRolePolicyDocument=awacs.aws.PolicyDocument(
+                Version='2012-10-17',
+                Statement=[
+                    awacs.aws.Statement(
+                        Effect=awacs.aws.Allow,
+                        Action=[awacs.sts.AssumeRole],
+                        Principal=awacs.aws.Principal("Service",
+                                                      "dax.amazonaws.com"),
+                    )
+                ]),
+            Policies=[
+                iam.Policy(
+                    PolicyName='DevicesTableAccess',
+                    PolicyDocument=awacs.aws.PolicyDocument(
+                        Version='2012-10-17',
+                        Statement=[
+                            awacs.aws.Statement(
+                                Effect=awacs.aws.Allow,
+                                Action=[awacs.aws.Action("dynamodb", "*")],
+                                Resource=[GetAtt(table, "Arn")],
+                            )
+                        ]))
+            ]))
+
+    subnet_group = template.add_resource(
+        dax.SubnetGroup(
+            'DevicesDaxSubnetGroup',
+            SubnetGroupName='devices-dax',
+            SubnetIds=settings['subnets']))
+
+    cluster = template.add_resource(
+        dax.Cluster(
+            'DevicesDaxCluster',
+            ClusterName='devices',
+            NodeType=settings['node_type'],
+            ReplicationFactor=settings['nodes'],
+            IAMRoleARN=GetAtt(role, "Arn"),
+            SubnetGroupName=Ref(subnet_group),
+            SecurityGroupIds=settings['security_groups'],
+            SSESpecification=dax.SSESpecification(SSEEnabled=True)))
+
+    template.add_output(
+        Output(
+            'DevicesDaxEndpoint',
+            Description='Devices table DAX cluster endpoint.',
+            Value=GetAtt(cluster, "ClusterDiscoveryEndpoint"),
+            Export=Export('DevicesDaxEndpoint')))
+
+
+def generate(template, settings):
+    validate(settings)
+
+    properties = dict(
+        TableName='Devices',
+        KeySchema=[
+            dynamodb.KeySchema(AttributeName='key', KeyType='HASH'),
+        ],
+        AttributeDefinitions=[
+            dynamodb.AttributeDefinition(
+                AttributeName='key', AttributeType='S'),
+        ])
+
+    if 'provisioned' == settings['mode']:
+        properties['BillingMode'] = 'PROVISIONED'
+        properties['ProvisionedThroughput'] = dynamodb.ProvisionedThroughput(
+            ReadCapacityUnits=settings['read']['min'],
+            WriteCapacityUnits=settings['write']['min'])
+    else:
+        properties['BillingMode'] = 'PAY_PER_REQUEST'
+
+    if settings['ttl_days'] is not None:
+        properties['TimeToLiveSpecification'] = dynamodb.TimeToLiveSpecification(
+            AttributeName=TTL_ATTRIBUTE, Enabled=True)
+
+    table = template.add_resource(dynamodb.Table('DevicesTable', **properties))
+
+    if 'provisioned' == settings['mode']:
+        autoscaling(template, table, 'read', settings['read'])
+        autoscaling(template, table, 'write', settings['write'])
+
+    if settings['dax']:
+        accelerator(template, table, settings['dax'])
+
+    return table
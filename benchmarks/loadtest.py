@@ -0,0 +1,588 @@
+import argparse
+import asyncio
+import base64
+import collections
+import itertools
+import json
+import math
+import os
+import ssl
+import time
+import urllib.parse
+
+PATH = '/android/register'
+
+parser = argparse.ArgumentParser(
+    description='Load test the Devices API /android/register endpoint.',
+    epilog='Point --url at the deployed stage, for example '
+    'https://<api id>.execute-api.<region>.amazonaws.com/v1/android/register, '
+    'or use --stand-in to test against a local stand-in endpoint.')
+parser.add_argument(
+    '--url',
+    type=str,
+    dest='url',
+    required=False,
+    default=None,
+    help='the registration endpoint to load')
+parser.add_argument(
+    '--stand-in',
+    action='store_true',
+    dest='stand_in',
+    help='start a local stand-in endpoint and load it instead of --url')
+parser.add_argument(
+    '--serve',
+    type=int,
+    dest='serve',
+    required=False,
+    default=None,
+    help='only run the stand-in endpoint on this port until interrupted')
+parser.add_argument(
+    '--stand-in-latency',
+    type=float,
+    dest='stand_in_latency',
+    required=False,
+    default=20,
+    help='how long the stand-in takes to answer, in milliseconds')
+parser.add_argument(
+    '--stand-in-rate',
+    type=float,
+    dest='stand_in_rate',
+    required=False,
+    default=None,
+    help='answer with 429 like API Gateway above this many requests per '
+    'second')
+parser.add_argument(
+    '--concurrency',
+    type=int,
+    dest='concurrency',
+    required=False,
+    default=10,
+    help='how many connections send requests at the same time')
+parser.add_argument(
+    '--rate',
+    type=float,
+    dest='rate',
+    required=False,
+    default=None,
+    help='requests per second to aim for, as fast as possible when missing; '
+    'latency is measured from when a request was due so a slow server is '
+    'not hidden by a slower request rate')
+parser.add_argument(
+    '--duration',
+    type=float,
+    dest='duration',
+    required=False,
+    default=10,
+    help='how long to send requests for, in seconds')
+parser.add_argument(
+    '--timeout',
+    type=float,
+    dest='timeout',
+    required=False,
+    default=30,
+    help='seconds to wait for a single response')
+parser.add_argument(
+    '--payloads',
+    type=str,
+    dest='payloads',
+    required=False,
+    default=None,
+    help='a file with one registration request JSON per line to replay in '
+    'order, synthetic requests are generated when missing')
+parser.add_argument(
+    '--header',
+    type=str,
+    dest='headers',
+    action='append',
+    default=[],
+    help='an extra request header as "Name: value", can be repeated')
+parser.add_argument(
+    '--output',
+    type=str,
+    dest='output',
+    required=False,
+    default=None,
+    help='also write the results as JSON to this file')
+
+
+class Histogram:
+    # log-linear buckets in microseconds, every power of two is split into
+    # SUB_BUCKETS linear buckets which keeps the error under 1/SUB_BUCKETS
+    SUB_BUCKETS = 32
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+
+    def bucket(self, value):
+        if value < self.SUB_BUCKETS:
+            return value
+
+        exponent = int(math.log2(value)) - int(math.log2(self.SUB_BUCKETS))
+        return (value >> exponent) << exponent
+
+    def record(self, seconds):
+        value = max(1, int(seconds * 1000000))
+
+        self.counts[self.bucket(value)] += 1
+        self.total += 1
+        self.minimum = value if self.minimum is None else min(
+            self.minimum, value)
+        self.maximum = value if self.maximum is None else max(
+            self.maximum, value)
+
+    def percentile(self, percent):
+        if not self.total:
+            return None
+
+        wanted = max(1, int(math.ceil(self.total * percent / 100.0)))
+        seen = 0
+
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+
+            if seen >= wanted:
+                return min(value, self.maximum) / 1000.0
+
+        return self.maximum / 1000.0
+
+    def rows(self, width=50):
+        if not self.total:
+            return []
+
+        edges = []
+        edge = 1
+
+        while edge <= self.maximum:
+            edge *= 2
+            edges.append(edge)
+
+        counts = [0] * len(edges)
+
+        for value, count in self.counts.items():
+            for index, upper in enumerate(edges):
+                if value < upper or index == len(edges) - 1:
+                    counts[index] += count
+                    break
+
+        first = next(index for index, count in enumerate(counts) if count)
+        largest = max(counts)
+
+        return [
+            "{:>10.1f}ms {:>8} {}".format(edges[index] / 1000.0, counts[index],
+                                          '#' * int(counts[index] * width /
+                                                    largest))
+            for index in range(first, len(edges))
+        ]
+
+
+def random_bytes(size):
+    return base64.b64encode(os.urandom(size)).decode('ascii')
+
+
+def synthetic():
+    header = base64.urlsafe_b64encode(
+        json.dumps(dict(alg='RS256')).encode('utf-8')).decode('ascii')
+    payload = base64.urlsafe_b64encode(
+        json.dumps(dict(nonce=random_bytes(32))).encode('utf-8')).decode(
+            'ascii')
+
+    return dict(
+        deviceCertificate=[random_bytes(700) for _ in range(3)],
+        identityAgreement=random_bytes(32),
+        safetyNet=header + '.' + payload + '.' + random_bytes(256),
+        token=random_bytes(120),
+        signature=random_bytes(72),
+        hashcash20=0)
+
+
+def payloads(path):
+    if path is None:
+        while True:
+            yield json.dumps(synthetic()).encode('utf-8')
+
+    with open(path) as f:
+        lines = [line.strip().encode('utf-8') for line in f if line.strip()]
+
+    if not lines:
+        raise ValueError(path + ' has no payloads')
+
+    yield from itertools.cycle(lines)
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+
+    if not status_line:
+        raise ConnectionError('connection closed before a response')
+
+    status = int(status_line.split()[1])
+    headers = dict()
+
+    while True:
+        line = await reader.readline()
+
+        if line in (b'\r\n', b'\n', b''):
+            break
+
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'chunked' == headers.get('transfer-encoding', '').lower():
+        body = b''
+
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+
+            if 0 == size:
+                await reader.readline()
+                break
+
+            body += await reader.readexactly(size)
+            await reader.readline()
+    else:
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+    return status, headers, body
+
+
+def reasons(body):
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        return ''
+
+    if not isinstance(parsed, dict):
+        return ''
+
+    if isinstance(parsed.get('error'), dict):
+        return ','.join(parsed['error'].get('reasons', []))
+
+    return parsed.get('message', '')
+
+
+class Client:
+    def __init__(self, url, headers, timeout):
+        self.url = urllib.parse.urlsplit(url)
+        self.headers = headers
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        secure = 'https' == self.url.scheme
+        port = self.url.port or (443 if secure else 80)
+
+        self.reader, self.writer = await asyncio.open_connection(
+            self.url.hostname,
+            port,
+            ssl=ssl.create_default_context() if secure else None)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+        self.reader = self.writer = None
+
+    async def post(self, body):
+        if self.writer is None:
+            await self.connect()
+
+        request = [
+            'POST ' + (self.url.path or '/') +
+            ('?' + self.url.query if self.url.query else '') + ' HTTP/1.1',
+            'Host: ' + self.url.netloc,
+            'Content-Type: application/json',
+            'Content-Length: ' + str(len(body)),
+            'Connection: keep-alive',
+        ] + self.headers
+
+        self.writer.write(('\r\n'.join(request) + '\r\n\r\n').encode('latin-1') +
+                          body)
+
+        try:
+            await self.writer.drain()
+            status, headers, body = await asyncio.wait_for(
+                read_response(self.reader), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+        if 'close' == headers.get('connection', '').lower():
+            self.close()
+
+        return status, body
+
+
+class Results:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = collections.Counter()
+        self.errors = collections.Counter()
+        self.started = None
+        self.finished = None
+
+    def record(self, seconds, status, body):
+        self.latency.record(seconds)
+        self.statuses[status] += 1
+
+        if status >= 400:
+            self.errors[str(status) + ' ' + reasons(body)] += 1
+
+    def failed(self, seconds, error):
+        self.latency.record(seconds)
+        self.statuses['failed'] += 1
+        self.errors[type(error).__name__] += 1
+
+    def summary(self):
+        elapsed = self.finished - self.started
+        total = self.latency.total
+
+        return dict(
+            requests=total,
+            seconds=round(elapsed, 3),
+            throughput=round(total / elapsed, 1) if elapsed else 0,
+            statuses=dict(
+                (str(key), value) for key, value in self.statuses.items()),
+            errors=dict(self.errors),
+            latency_ms=dict(
+                min=self.latency.minimum / 1000.0 if total else None,
+                p50=self.latency.percentile(50),
+                p90=self.latency.percentile(90),
+                p99=self.latency.percentile(99),
+                p999=self.latency.percentile(99.9),
+                max=self.latency.maximum / 1000.0 if total else None))
+
+
+async def worker(client, schedule, bodies, results):
+    for due in schedule:
+        if due is not None:
+            delay = due - time.perf_counter()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        started = due if due is not None else time.perf_counter()
+
+        try:
+            status, body = await client.post(next(bodies))
+        except Exception as e:
+            results.failed(time.perf_counter() - started, e)
+            continue
+
+        results.record(time.perf_counter() - started, status, body)
+
+    client.close()
+
+
+def schedule(rate, duration):
+    started = time.perf_counter()
+    deadline = started + duration
+
+    for index in itertools.count():
+        if rate is None:
+            if time.perf_counter() >= deadline:
+                return
+
+            yield None
+        else:
+            due = started + index / rate
+
+            if due >= deadline:
+                return
+
+            yield due
+
+
+async def load(args, url):
+    headers = [header.strip() for header in args.headers]
+    results = Results()
+    shared = schedule(args.rate, args.duration)
+    bodies = payloads(args.payloads)
+
+    results.started = time.perf_counter()
+
+    await asyncio.gather(*[
+        worker(Client(url, headers, args.timeout), shared, bodies, results)
+        for _ in range(args.concurrency)
+    ])
+
+    results.finished = time.perf_counter()
+
+    return results
+
+
+def report(results):
+    summary = results.summary()
+
+    print(">>> {} requests in {:.1f}s, {} requests/s".format(
+        summary['requests'], summary['seconds'], summary['throughput']))
+
+    print(">>> latency " + ", ".join(
+        "{} {:.1f}ms".format(key, value)
+        for key, value in summary['latency_ms'].items() if value is not None))
+
+    for row in results.latency.rows():
+        print(row)
+
+    print(">>> statuses " + ", ".join(
+        "{}: {}".format(key, value)
+        for key, value in sorted(summary['statuses'].items())))
+
+    for error, count in results.errors.most_common():
+        print(">>> error {:>8} {}".format(count, error))
+
+    return summary
+
+
+class StandIn:
+    REQUIRED = ['deviceCertificate', 'identityAgreement', 'safetyNet', 'token',
+                'signature', 'hashcash20']
+
+    def __init__(self, latency, rate):
+        self.latency = latency / 1000.0
+        self.rate = rate
+        self.tokens = rate or 0
+        self.refilled = time.perf_counter()
+
+    def throttled(self):
+        if self.rate is None:
+            return False
+
+        now = time.perf_counter()
+        self.tokens = min(self.rate,
+                          self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+        if self.tokens < 1:
+            return True
+
+        self.tokens -= 1
+        return False
+
+    def answer(self, headers, body):
+        if self.throttled():
+            return 429, dict(message='Too Many Requests')
+
+        if 'application/json' != headers.get('content-type'):
+            return 400, dict(error=dict(code=400, reasons=['body-not-json']))
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return 400, dict(error=dict(code=400, reasons=['body-bad-json']))
+
+        if not isinstance(request, dict) or sorted(request) != sorted(
+                self.REQUIRED):
+            return 400, dict(error=dict(code=400, reasons=['body-bad-json']))
+
+        if len(request['token']) < 16:
+            return 400, dict(error=dict(code=400, reasons=['token-too-short']))
+
+        return 200, dict(
+            result=dict(
+                identityKey=random_bytes(64), certificateDescription=dict()))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line:
+                    break
+
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = dict()
+
+                while True:
+                    line = await reader.readline()
+
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(
+                    int(headers.get('content-length', 0)))
+
+                if 'POST' != method or PATH != target.split('?')[0]:
+                    status, response = 404, dict(message='Not Found')
+                else:
+                    status, response = self.answer(headers, body)
+
+                    if status != 429:
+                        await asyncio.sleep(self.latency)
+
+                data = json.dumps(response).encode('utf-8')
+
+                writer.write(('HTTP/1.1 {} {}\r\n'
+                              'Content-Type: application/json\r\n'
+                              'Content-Length: {}\r\n\r\n').format(
+                                  status, 'OK' if 200 == status else 'Error',
+                                  len(data)).encode('latin-1') + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, port=0):
+        server = await asyncio.start_server(self.handle, '127.0.0.1', port)
+        port = server.sockets[0].getsockname()[1]
+
+        return server, 'http://127.0.0.1:' + str(port) + PATH
+
+
+async def main_async(args):
+    stand_in = StandIn(args.stand_in_latency, args.stand_in_rate)
+
+    if args.serve is not None:
+        server, url = await stand_in.start(args.serve)
+        print(">>> stand-in listening on " + url, flush=True)
+
+        async with server:
+            await server.serve_forever()
+
+    server = None
+    url = args.url
+
+    if args.stand_in:
+        server, url = await stand_in.start()
+        print(">>> stand-in listening on " + url, flush=True)
+
+    print(">>> loading {} with {} connections for {}s at {}".format(
+        url, args.concurrency, args.duration,
+        str(args.rate) + ' requests/s' if args.rate else 'full speed'),
+          flush=True)
+
+    try:
+        results = await load(args, url)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    return report(results)
+
+
+def main():
+    args = parser.parse_args()
+
+    if args.serve is None and not args.stand_in and not args.url:
+        parser.error('one of --url, --stand-in or --serve is required')
+
+    try:
+        summary = asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        return
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import os.path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = '''
+import runpy
+import sys
+
+sys.argv = sys.argv[1:]
+
+try:
+    runpy.run_path('deploy.py', run_name='__main__')
+finally:
+    loaded = sorted(name for name in sys.modules
+                    if name.split('.')[0] in ['boto3', 'botocore', 's3transfer'])
+    if loaded:
+        sys.stderr.write('loaded AWS SDK modules: ' + ', '.join(loaded) + '\\n')
+        sys.exit(2)
+'''
+
+parser = argparse.ArgumentParser(
+    description='Measure the cold start of deploy.py --synth.')
+parser.add_argument(
+    '--stack',
+    type=str,
+    dest='stack',
+    required=False,
+    default='all',
+    help='the stacks to synthesize')
+parser.add_argument(
+    '--runs',
+    type=int,
+    dest='runs',
+    required=False,
+    default=5,
+    help='how many times to start the interpreter')
+parser.add_argument(
+    '--budget',
+    type=float,
+    dest='budget',
+    required=False,
+    default=1.0,
+    help='the median start-to-exit time allowed, in seconds')
+
+
+def main():
+    args = parser.parse_args()
+
+    timings = []
+
+    with tempfile.TemporaryDirectory() as output:
+        for _ in range(args.runs):
+            started = time.perf_counter()
+
+            process = subprocess.run(
+                [
+                    sys.executable, '-c', CHECK, 'deploy.py', '--stack',
+                    args.stack, '--synth', '--output', output
+                ],
+                cwd=ROOT,
+                stdout=subprocess.DEVNULL)
+
+            timings.append(time.perf_counter() - started)
+
+            if 0 != process.returncode:
+                exit(process.returncode)
+
+    median = statistics.median(timings)
+
+    print("synth of '{}': median {:.3f}s, min {:.3f}s, max {:.3f}s, "
+          "budget {:.3f}s".format(args.stack, median, min(timings),
+                                  max(timings), args.budget))
+
+    if median > args.budget:
+        print("over budget by {:.3f}s".format(median - args.budget))
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import importlib
+import json
+import os
+import os.path
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results')
+
+STACKS = ['root', 'pushnotifications', 'apidevices']
+
+parser = argparse.ArgumentParser(
+    description='Benchmark template synthesis for every stack.')
+parser.add_argument(
+    '--stack',
+    type=str,
+    dest='stack',
+    required=False,
+    default='all',
+    help='the stacks to benchmark, separated by commas, or "all"')
+parser.add_argument(
+    '--runs',
+    type=int,
+    dest='runs',
+    required=False,
+    default=5,
+    help='how many times to synthesize each stack')
+parser.add_argument(
+    '--save',
+    type=str,
+    dest='save',
+    required=False,
+    default=None,
+    help='store the results under this name in benchmarks/results')
+parser.add_argument(
+    '--baseline',
+    type=str,
+    dest='baseline',
+    required=False,
+    default=None,
+    help='compare against the results stored under this name')
+parser.add_argument(
+    '--threshold',
+    type=float,
+    dest='threshold',
+    required=False,
+    default=0.2,
+    help='the relative increase over the baseline that counts as a '
+    'regression')
+
+
+def synthesize(name):
+    from deployment import templates
+
+    for loaded in [
+            module for module in sys.modules
+            if module == name or module.startswith(name + '.')
+    ]:
+        del sys.modules[loaded]
+
+    mod = importlib.import_module(name)
+    template = getattr(mod, "template")
+
+    return template, template.to_yaml(), templates.serialize(template)
+
+
+def measure(name, runs):
+    timings = []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        template, template_yaml, template_json = synthesize(name)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    synthesize(name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return dict(
+        resources=len(template.resources),
+        yaml_bytes=len(template_yaml.encode('utf-8')),
+        json_bytes=len(template_json.encode('utf-8')),
+        peak_memory_bytes=peak,
+        wall_seconds=min(timings))
+
+
+def regressions(results, baseline, threshold):
+    found = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        for metric, value in result.items():
+            previous = baseline[name].get(metric)
+
+            if previous and value > previous * (1 + threshold):
+                found.append((name, metric, previous, value))
+
+    return found
+
+
+def main():
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+
+    names = STACKS if 'all' == args.stack else args.stack.split(',')
+    results = dict()
+
+    print("{:<20} {:>9} {:>10} {:>10} {:>12} {:>10}".format(
+        'stack', 'resources', 'yaml', 'json', 'peak memory', 'wall'))
+
+    for name in names:
+        result = measure(name, args.runs)
+        results[name] = result
+
+        print("{:<20} {:>9} {:>10} {:>10} {:>12} {:>9.1f}ms".format(
+            name, result['resources'], result['yaml_bytes'],
+            result['json_bytes'], result['peak_memory_bytes'],
+            result['wall_seconds'] * 1000))
+
+    if args.save:
+        os.makedirs(RESULTS, exist_ok=True)
+
+        with open(os.path.join(RESULTS, args.save + '.json'), 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(os.path.join(RESULTS, args.baseline + '.json')) as f:
+            baseline = json.load(f)
+
+        found = regressions(results, baseline, args.threshold)
+
+        for name, metric, previous, value in found:
+            print("regression: {} {} went from {} to {}".format(
+                name, metric, previous, value))
+
+        if found:
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,48 @@
-import boto3
 import time
 import argparse
+import concurrent.futures
+import difflib
 import os.path
 import importlib
-import yaml
+import sys
+import traceback
+
+from deployment import aws, environment, events, exports, graph, phases
+from deployment import templates
+from deployment import trace, watch
+
+STACKS = ['root', 'pushnotifications', 'apidevices']
 
 parser = argparse.ArgumentParser(description='Deploy a stack.')
 parser.add_argument(
     '--region',
     type=str,
     dest='region',
-    required=True,
-    help='the AWS region that this deployment is occuring in')
+    required=False,
+    help='the AWS region that this deployment is occuring in, several '
+    'regions separated by commas deploy to each of them at the same time')
 parser.add_argument(
     '--account',
     type=str,
     dest='account',
-    required=True,
-    help='the AWS account ID')
+    required=False,
+    help='the AWS account ID, several accounts separated by commas deploy '
+    'to each of them at the same time')
 parser.add_argument(
     '--stack',
     type=str,
     dest='stack',
     required=True,
-    help='the stack name, a file stack.py.yaml should exist')
+    help='the stack name, a file stack.py.yaml should exist; several stacks '
+    'can be given separated by commas, or "all" for every stack')
+parser.add_argument(
+    '--environment',
+    type=str,
+    dest='environment',
+    required=False,
+    default=environment.DEFAULT,
+    choices=environment.NAMES,
+    help='the environment whose settings the stacks are synthesized with')
 parser.add_argument(
     '--execute',
     type=bool,
@@ -31,82 +50,483 @@ parser.add_argument(
     required=False,
     default=False,
     help='whether to execute the change immediately')
+parser.add_argument(
+    '--skip-build',
+    action='store_true',
+    dest='skip_build',
+    help='use the artifacts already on disk instead of running pre_deploy')
+parser.add_argument(
+    '--synth',
+    action='store_true',
+    dest='synth',
+    help='only synthesize the templates and write them to --output, '
+    'without calling AWS')
+parser.add_argument(
+    '--diff-local',
+    action='store_true',
+    dest='diff_local',
+    help='synthesize the templates and show how they differ from the ones '
+    'last written with --synth, exits with 1 when they do')
+parser.add_argument(
+    '--output',
+    type=str,
+    dest='output',
+    required=False,
+    default=os.path.join('.deploy', 'templates'),
+    help='the directory --synth writes templates to')
+parser.add_argument(
+    '--watch',
+    action='store_true',
+    dest='watch',
+    help='keep running, re-synthesize stacks whose modules change and show '
+    'the template diff, press enter to push a change set')
+parser.add_argument(
+    '--watch-interval',
+    type=float,
+    dest='watch_interval',
+    required=False,
+    default=0.25,
+    help='how often --watch looks for changed files, in seconds')
+parser.add_argument(
+    '--trace',
+    type=str,
+    dest='trace',
+    required=False,
+    default=None,
+    help='write a Chrome trace of every deploy phase to this file and print '
+    'a summary of their timings')
+parser.add_argument(
+    '--parallelism',
+    type=int,
+    dest='parallelism',
+    required=False,
+    default=4,
+    help='how many independent stacks to deploy at the same time')
+parser.add_argument(
+    '--part-size',
+    type=int,
+    dest='part_size',
+    required=False,
+    default=8,
+    help='multipart upload part size for artifacts, in MB')
+parser.add_argument(
+    '--upload-concurrency',
+    type=int,
+    dest='upload_concurrency',
+    required=False,
+    default=8,
+    help='how many artifact parts to upload at the same time')
+parser.add_argument(
+    '--retry-mode',
+    type=str,
+    dest='retry_mode',
+    required=False,
+    default='adaptive',
+    choices=['legacy', 'standard', 'adaptive'],
+    help='how AWS API calls are retried, adaptive also slows down client '
+    'side when the account is being throttled')
+parser.add_argument(
+    '--max-attempts',
+    type=int,
+    dest='max_attempts',
+    required=False,
+    default=10,
+    help='how many times an AWS API call is attempted before giving up')
+parser.add_argument(
+    '--max-pool-connections',
+    type=int,
+    dest='max_pool_connections',
+    required=False,
+    default=50,
+    help='how many HTTP connections every AWS client keeps open')
+parser.add_argument(
+    '--connect-timeout',
+    type=int,
+    dest='connect_timeout',
+    required=False,
+    default=10,
+    help='seconds to wait for a connection to an AWS endpoint')
+parser.add_argument(
+    '--read-timeout',
+    type=int,
+    dest='read_timeout',
+    required=False,
+    default=60,
+    help='seconds to wait for an AWS endpoint to answer')
+parser.add_argument(
+    '--assume-role',
+    type=str,
+    dest='assume_role',
+    required=False,
+    default=None,
+    help='the name of the role to assume in every account before deploying, '
+    'for example Deploy, credentials are cached on disk and shared between '
+    'concurrent deploys')
+parser.add_argument(
+    '--cloudformation-role',
+    type=str,
+    dest='cloudformation_role',
+    required=False,
+    default='CloudFormationDeploy',
+    help='the name of the role CloudFormation deploys with when --assume-role '
+    'is given, the assumed role itself may only pass it on')
+parser.add_argument(
+    '--session-duration',
+    type=int,
+    dest='session_duration',
+    required=False,
+    default=3600,
+    help='how long assumed role credentials last, in seconds, from 1800 to '
+    '3600')
+parser.add_argument(
+    '--credential-cache',
+    type=str,
+    dest='credential_cache',
+    required=False,
+    default=None,
+    help='where assumed role credentials are cached, defaults to '
+    '~/.cache/pasbox/credentials')
+parser.add_argument(
+    '--force-build',
+    action='store_true',
+    dest='force_build',
+    help='rebuild components even when their sources are unchanged')
+
+
+def log(name, message):
+    print(">>> [" + name + "] " + message, flush=True)
+
+
+def split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def stack_names(stack):
+    if 'all' == stack:
+        return list(STACKS)
+
+    return split(stack)
+
+
+def synth(args, name, mod):
+    path = os.path.join(args.output, name + '.yaml')
+
+    os.makedirs(args.output, exist_ok=True)
+
+    with open(path, 'w') as f:
+        f.write(getattr(mod, "template").to_yaml())
+
+    print(">>> wrote " + path)
+
+
+def diff_local(args, name, mod):
+    path = os.path.join(args.output, name + '.yaml')
+
+    previous = []
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = f.read().splitlines(True)
+
+    current = getattr(mod, "template").to_yaml().splitlines(True)
+
+    diff = list(difflib.unified_diff(previous, current, path, name))
+    sys.stdout.writelines(diff)
+
+    return bool(diff)
+
+
+def deploy_stack(args, name, mod, built, pending):
+    import yaml
+
+    label = name + args.target
+    template = getattr(mod, "template")
+
+    with phases.phase(label + "/synthesize"):
+        body = templates.serialize(template)
+
+    parameters = list(built)
+
+    cloudformation_client = aws.client('cloudformation', args.region,
+                                       args.account)
+    cloudformation_resource = aws.resource('cloudformation', args.region,
+                                           args.account)
+
+    if hasattr(mod, "deploy"):
+        log(label, "deploy")
+
+        with phases.phase(label + "/deploy"):
+            ret = getattr(mod, "deploy")(args)
+
+        if isinstance(ret, list):
+            for item in ret:
+                parameters.append(item)
+
+    with phases.phase(label + "/exports"):
+        exports.check(args, body, pending)
+
+    log(label, "looking for existing stack")
+
+    with phases.phase(label + "/lookup"):
+        all_stacks = cloudformation_resource.stacks.all()
+        stack = None
+
+        for existing_stack in all_stacks:
+            if name == existing_stack.name:
+                stack = existing_stack
+                log(label, "found existing stack")
+                break
+
+        if stack and stack.stack_status in ['REVIEW_IN_PROGRESS']:
+            log(label, "stack is in review")
+            stack = None
+
+        # a rolled back stack doesn't run the template it reports, it always
+        # gets a change set
+        if stack and events.succeeded(stack.stack_status) and \
+                templates.unchanged(cloudformation_client, stack, body,
+                                    parameters):
+            log(label, "template and parameters unchanged, nothing to deploy")
+            return
+
+    log(label, "creating change set")
+
+    with phases.phase(label + "/change_set"):
+        template_arguments = templates.arguments(
+            aws.client('s3', args.region, args.account), args.region,
+            lambda: exports.bucket(args), name, body,
+            lambda _, message: log(label, message))
+
+        # the assumed role can't create the stack resources itself, it hands
+        # a service role to CloudFormation
+        if args.assume_role:
+            template_arguments['RoleARN'] = 'arn:aws:iam::' + args.account + \
+                ':role/' + args.cloudformation_role
+
+        change_set_name = name + "-" + str(int(time.time()))
+        change_set = cloudformation_client.create_change_set(
+            ChangeSetName=change_set_name,
+            StackName=name,
+            ChangeSetType='CREATE' if not stack else 'UPDATE',
+            Parameters=parameters,
+            Capabilities=['CAPABILITY_NAMED_IAM'],
+            **template_arguments)
+
+    log(label, "change set ready")
+    print(yaml.dump(change_set))
+
+    log(label, "wait for change set")
+
+    with phases.phase(label + "/wait"):
+        description = events.wait_for_change_set(
+            cloudformation_client, name, change_set_name)
+
+    # CloudFormation keeps failed change sets around, empty ones would pile up
+    # on every stack that is deployed without changes
+    if events.no_changes(description):
+        log(label, "change set contains no changes, deleting it")
+        cloudformation_client.delete_change_set(
+            StackName=name, ChangeSetName=change_set_name)
+        return
+
+    if 'FAILED' == description['Status']:
+        log(label, "change set failed: " + description.get('StatusReason', ''))
+        exit(1)
+
+    if args.execute:
+        log(label, "execute change set")
+
+        print(yaml.dump(description))
+
+        with phases.phase(label + "/execute"):
+            cloudformation_client.execute_change_set(
+                StackName=name,
+                ChangeSetName=change_set_name,
+                ClientRequestToken=change_set_name)
+
+            status = events.tail(cloudformation_client, name, change_set_name,
+                                 lambda _, message: log(label, message))
+
+        exports.invalidate(args)
+
+        if not events.succeeded(status):
+            exit(1)
+
+    if hasattr(mod, "post_deploy"):
+        log(label, "post deploy")
+
+        with phases.phase(label + "/post_deploy"):
+            getattr(mod, "post_deploy")(args)
+
+
+def build(args, modules):
+    built = dict()
+
+    for name, mod in modules.items():
+        built[name] = []
+
+        if hasattr(mod, "pre_deploy") and not args.skip_build:
+            log(name, "pre deploy")
+
+            with phases.phase(name + "/pre_deploy"):
+                ret = getattr(mod, "pre_deploy")(args)
+
+            if isinstance(ret, list):
+                built[name] = ret
+
+    return built
+
+
+def fan_out(args):
+    accounts = split(args.account)
+    regions = split(args.region)
+
+    targets = []
+
+    for account in accounts:
+        for region in regions:
+            target = argparse.Namespace(**vars(args))
+            target.account = account
+            target.region = region
+            target.target = ''
+
+            if len(accounts) * len(regions) > 1:
+                target.target = '@' + account + '/' + region
+
+            targets.append(target)
+
+    return targets
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    if not args.trace:
+        run(args)
+        return
+
+    trace.install()
+
+    try:
+        run(args)
+    finally:
+        trace.summary()
+        trace.write(args.trace)
+
+
+def run(args):
+    os.environ[environment.VARIABLE] = args.environment
+
+    modules = dict()
+
+    for name in stack_names(args.stack):
+        with phases.phase(name + "/import"):
+            modules[name] = importlib.import_module(name)
+
+    if args.synth:
+        for name, mod in modules.items():
+            synth(args, name, mod)
+        return
+
+    if args.diff_local:
+        changed = [diff_local(args, name, mod) for name, mod in modules.items()]
 
-args = parser.parse_args()
+        if any(changed):
+            exit(1)
+        return
 
-mod = importlib.import_module(args.stack)
+    if args.watch:
+        watch.run(modules, args.watch_interval,
+                  lambda modules: push(args, modules))
+        return
 
-template = getattr(mod, "template")
-template_yaml = template.to_yaml()
+    if not args.region or not args.account:
+        parser.error('--region and --account are required to deploy')
 
-parameters = []
+    deploy(args, modules)
 
-cloudformation_client = boto3.client('cloudformation')
-cloudformation_resource = boto3.resource('cloudformation')
 
-if hasattr(mod, "pre_deploy"):
-    print(">>> pre deploy")
-    ret = getattr(mod, "pre_deploy")(args)
+def push(args, modules):
+    if not args.region or not args.account:
+        print(">>> --region and --account are required to push change sets")
+        return
 
-    if isinstance(ret, list):
-        for item in ret:
-            parameters.append(item)
+    try:
+        deploy(args, modules)
+    except SystemExit as e:
+        print(">>> deploy failed with exit code " + str(e.code))
+    except Exception:
+        traceback.print_exc()
 
-if hasattr(mod, "deploy"):
-    print(">>> deploy")
-    ret = getattr(mod, "deploy")(args)
 
-    if isinstance(ret, list):
-        for item in ret:
-            parameters.append(item)
+def deploy(args, modules):
+    # without a role to assume every account target would share the one set
+    # of credentials and deploy into the same account concurrently
+    if len(set(split(args.account))) > 1 and not args.assume_role:
+        print(">>> deploying to several accounts needs --assume-role")
+        exit(1)
 
-print(">>> looking for existing stack")
+    aws.configure(
+        retry_mode=args.retry_mode,
+        max_attempts=args.max_attempts,
+        max_pool_connections=max(args.max_pool_connections,
+                                 args.upload_concurrency),
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        role=args.assume_role,
+        session_duration=args.session_duration,
+        credential_cache=args.credential_cache)
 
-all_stacks = cloudformation_resource.stacks.all()
-stack = None
+    dependencies = graph.dependencies(modules)
+    pending = set(export for mod in modules.values()
+                  for export in graph.exports(mod.template))
+    built = build(args, modules)
+    targets = fan_out(args)
 
-for existing_stack in all_stacks:
-    if args.stack == existing_stack.name:
-        stack = existing_stack
-        print(">>> found existing stack")
-        break
+    if 1 == len(modules) and 1 == len(targets):
+        name = list(modules.keys())[0]
+        deploy_stack(targets[0], name, modules[name], built[name], pending)
+        return
 
-if stack and stack.stack_status in ['REVIEW_IN_PROGRESS']:
-    print(">>> stack is in review")
-    stack = None
+    print(">>> deploying stacks in order: " +
+          ", ".join(graph.order(dependencies)))
 
-print(">>> creating change set")
+    def deploy_target(target):
+        return graph.run(
+            dependencies,
+            lambda name: deploy_stack(target, name, modules[name], built[name],
+                                      pending),
+            parallelism=args.parallelism)
 
-change_set_name = args.stack + "-" + str(int(time.time()))
-change_set = cloudformation_client.create_change_set(
-    ChangeSetName=change_set_name,
-    StackName=args.stack,
-    TemplateBody=template_yaml,
-    ChangeSetType='CREATE' if not stack else 'UPDATE',
-    Parameters=parameters,
-    Capabilities=['CAPABILITY_NAMED_IAM'])
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(targets)) as executor:
+        results = list(executor.map(deploy_target, targets))
 
-print(">>> change set ready")
-print(yaml.dump(change_set))
+    failed = False
 
-if args.execute:
-    print(">>> wait for change set")
-    description = cloudformation_client.describe_change_set(
-        StackName=args.stack, ChangeSetName=change_set_name)
+    print(">>> deployment report")
 
-    waiter = cloudformation_client.get_waiter('change_set_create_complete')
-    waiter.wait(ChangeSetName=change_set_name, StackName=args.stack)
+    for target, result in zip(targets, results):
+        for name in graph.order(dependencies):
+            status = result.get(name)
 
-    print(">>> execute change set")
+            if status is True:
+                print(">>> " + name + target.target + ": ok")
+            elif status is None:
+                failed = True
+                print(">>> " + name + target.target +
+                      ": skipped, a dependency failed")
+            else:
+                failed = True
+                print(">>> " + name + target.target + ": failed, " +
+                      repr(status))
 
-    description = cloudformation_client.describe_change_set(
-        StackName=args.stack, ChangeSetName=change_set_name)
+                if not isinstance(status, SystemExit):
+                    traceback.print_exception(
+                        type(status), status, status.__traceback__)
 
-    print(yaml.dump(description))
+    if failed:
+        exit(1)
 
-    cloudformation_client.execute_change_set(
-        StackName=args.stack, ChangeSetName=change_set_name)
 
-if hasattr(mod, "post_deploy"):
-    print(">>> post deploy")
-    getattr(mod, "post_deploy")(args)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import concurrent.futures
+import hashlib
+import os.path
+import threading
+import time
+
+from deployment import aws, phases
+
+MB = 1024 * 1024
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as artifact:
+        for chunk in iter(lambda: artifact.read(MB), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def artifact(parameter, bucket, key, path):
+    return dict(parameter=parameter, bucket=bucket, key=key, path=path)
+
+
+def existing_version(s3_client, bucket, key, digest):
+    try:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ['404', 'NoSuchKey']:
+            return None
+
+        raise
+
+    if digest == head.get('Metadata', {}).get('sha256'):
+        return head.get('VersionId')
+
+    return None
+
+
+def progress(total):
+    lock = threading.Lock()
+    state = dict(sent=0, reported=time.time(), started=time.time())
+
+    def report(sent):
+        with lock:
+            state['sent'] += sent
+            now = time.time()
+
+            if now - state['reported'] < 2 and state['sent'] < total:
+                return
+
+            state['reported'] = now
+            print(">>> uploaded {:.1f} of {:.1f} MB ({:.2f} MB/s)".format(
+                state['sent'] / MB, total / MB,
+                state['sent'] / MB / max(now - state['started'], 0.001)),
+                  flush=True)
+
+    return report
+
+
+def upload_all(s3_client, items, part_size=8 * MB, concurrency=8):
+    from boto3.s3.transfer import TransferConfig, ProgressCallbackInvoker
+    from s3transfer.manager import TransferManager
+
+    versions = dict()
+    uploads = []
+
+    for item in items:
+        item['sha256'] = sha256(item['path'])
+        version = existing_version(s3_client, item['bucket'], item['key'],
+                                   item['sha256'])
+
+        if version:
+            print(">>> artifact 's3://" + item['bucket'] + "/" + item['key'] +
+                  "' is unchanged, reusing version " + version)
+            versions[item['parameter']] = version
+        else:
+            uploads.append(item)
+
+    if not uploads:
+        return versions
+
+    config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=concurrency)
+
+    total = sum(os.path.getsize(item['path']) for item in uploads)
+
+    started = time.time()
+    report = progress(total)
+
+    parent = phases.current()
+
+    def transfer(manager, item):
+        with phases.phase((parent or "deploy") + "/upload " + item['key']):
+            print(">>> uploading '" + item['path'] + "' to 's3://" +
+                  item['bucket'] + "/" + item['key'] + "'")
+
+            manager.upload(
+                item['path'],
+                item['bucket'],
+                item['key'],
+                extra_args=dict(Metadata=dict(sha256=item['sha256'])),
+                subscribers=[ProgressCallbackInvoker(report)]).result()
+
+    # the requests run on the manager's threads, phases.Executor lets them
+    # count towards the upload phase they were started in
+    with TransferManager(s3_client, config,
+                         executor_cls=phases.Executor) as manager:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(uploads)) as executor:
+            list(executor.map(lambda item: transfer(manager, item), uploads))
+
+    elapsed = max(time.time() - started, 0.001)
+    print(">>> uploaded {} artifacts, {:.1f} MB in {:.1f}s ({:.2f} MB/s)".format(
+        len(uploads), total / MB, elapsed, total / MB / elapsed))
+
+    for item in uploads:
+        version = existing_version(s3_client, item['bucket'], item['key'],
+                                   item['sha256'])
+
+        if not version:
+            raise RuntimeError("artifact 's3://" + item['bucket'] + "/" +
+                               item['key'] + "' was replaced during upload")
+
+        versions[item['parameter']] = version
+
+    return versions
+
+
+def deploy(args, items):
+    s3_client = aws.client('s3', args.region, args.account)
+
+    versions = upload_all(
+        s3_client,
+        items,
+        part_size=getattr(args, 'part_size', 8) * MB,
+        concurrency=getattr(args, 'upload_concurrency', 8))
+
+    params = []
+
+    for item in items:
+        params.append(
+            dict(
+                ParameterKey=item['parameter'] + 'ArtifactBucket',
+                ParameterValue=item['bucket']))
+        params.append(
+            dict(
+                ParameterKey=item['parameter'] + 'ArtifactName',
+                ParameterValue=item['key']))
+        params.append(
+            dict(
+                ParameterKey=item['parameter'] + 'ArtifactVersion',
+                ParameterValue=versions[item['parameter']]))
+
+    return params
@@ -0,0 +1,100 @@
+import threading
+
+from deployment import credentials
+
+options = dict()
+handlers = []
+
+config = dict(
+    retry_mode='adaptive',
+    max_attempts=10,
+    max_pool_connections=50,
+    connect_timeout=10,
+    read_timeout=60,
+    role=None,
+    session_duration=credentials.MAX_DURATION,
+    credential_cache=None)
+
+lock = threading.RLock()
+sessions = dict()
+clients = dict()
+local = threading.local()
+
+
+def configure(**settings):
+    with lock:
+        config.update(settings)
+        sessions.clear()
+        clients.clear()
+
+
+def register(events):
+    for event, handler in handlers:
+        events.register(event, handler)
+
+
+def session(account=None):
+    import boto3.session
+
+    key = account if config['role'] else None
+
+    with lock:
+        if key not in sessions:
+            if key is None:
+                sessions[key] = boto3.session.Session(**options)
+            else:
+                source = session()
+                sts_client = source.client(
+                    'sts',
+                    region_name=source.region_name or 'us-east-1',
+                    config=client_config())
+                register(sts_client.meta.events)
+
+                sessions[key] = credentials.session(
+                    source, sts_client,
+                    'arn:aws:iam::' + account + ':role/' + config['role'],
+                    config['session_duration'],
+                    config['credential_cache'] or credentials.CACHE)
+
+        return sessions[key]
+
+
+def client_config():
+    from botocore.config import Config
+
+    return Config(
+        retries=dict(
+            mode=config['retry_mode'], max_attempts=config['max_attempts']),
+        max_pool_connections=config['max_pool_connections'],
+        connect_timeout=config['connect_timeout'],
+        read_timeout=config['read_timeout'])
+
+
+def client(service, region=None, account=None):
+    key = (service, region, account)
+
+    with lock:
+        if key not in clients:
+            created = session(account).client(
+                service, region_name=region, config=client_config())
+            register(created.meta.events)
+            clients[key] = created
+
+        return clients[key]
+
+
+def resource(service, region=None, account=None):
+    if not hasattr(local, 'resources'):
+        local.resources = dict()
+
+    key = (service, region, session(account))
+
+    if key not in local.resources:
+        with lock:
+            created = session(account).resource(
+                service, region_name=region, config=client_config())
+
+        register(created.meta.client.meta.events)
+        local.resources[key] = created
+
+    return local.resources[key]
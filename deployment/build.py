@@ -0,0 +1,139 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import os.path
+import subprocess
+import threading
+
+from deployment import phases
+
+STATE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.deploy',
+    'builds.json')
+
+IGNORED = ['.git', '.gradle', '.idea', 'build', 'dist', 'node_modules', 'out',
+           '__pycache__']
+
+lock = threading.Lock()
+
+
+def component(name, path, commands, sources, outputs):
+    return dict(
+        name=name,
+        path=path,
+        commands=commands,
+        sources=sources,
+        outputs=outputs)
+
+
+def files(source):
+    if os.path.isfile(source):
+        return [source]
+
+    found = []
+
+    for directory, directories, names in os.walk(source):
+        directories[:] = sorted(name for name in directories
+                                if name not in IGNORED)
+
+        for name in sorted(names):
+            if not name.endswith('.zip'):
+                found.append(os.path.join(directory, name))
+
+    return found
+
+
+def fingerprint(item):
+    digest = hashlib.sha256()
+
+    for command in item['commands']:
+        digest.update(command.encode('utf-8') + b'\0')
+
+    for source in item['sources']:
+        for path in files(source):
+            digest.update(os.path.relpath(path, item['path']).encode('utf-8') + b'\0')
+
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+
+    return digest.hexdigest()
+
+
+def load():
+    if not os.path.exists(STATE):
+        return dict()
+
+    with open(STATE) as f:
+        return json.load(f)
+
+
+def save(name, digest):
+    with lock:
+        state = load()
+        state[name] = digest
+
+        os.makedirs(os.path.dirname(STATE), exist_ok=True)
+
+        with open(STATE + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+
+        os.replace(STATE + '.tmp', STATE)
+
+
+def up_to_date(item, digest):
+    return digest == load().get(item['name']) and all(
+        os.path.exists(output) for output in item['outputs'])
+
+
+def run_command(item, command):
+    print(">>> [" + item['name'] + "] run '" + command + "' in '" +
+          item['path'] + "'", flush=True)
+
+    process = subprocess.Popen(
+        command,
+        cwd=item['path'],
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True)
+
+    for line in process.stdout:
+        print("[" + item['name'] + "] " + line.rstrip(), flush=True)
+
+    process.wait()
+
+    return process.returncode
+
+
+def execute(item, force=False):
+    digest = fingerprint(item)
+
+    if not force and up_to_date(item, digest):
+        print(">>> [" + item['name'] + "] sources unchanged, skipping build",
+              flush=True)
+        return 0
+
+    for command in item['commands']:
+        with phases.phase(item['name'] + "/build " + command):
+            returncode = run_command(item, command)
+
+        if 0 != returncode:
+            return returncode
+
+    save(item['name'], digest)
+
+    return 0
+
+
+def run(args, items):
+    force = getattr(args, 'force_build', False)
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(items), 1)) as executor:
+        returncodes = list(
+            executor.map(lambda item: execute(item, force), items))
+
+    for returncode in returncodes:
+        if 0 != returncode:
+            exit(returncode)
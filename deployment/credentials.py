@@ -0,0 +1,126 @@
+import datetime
+import fcntl
+import hashlib
+import json
+import os
+import os.path
+
+CACHE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'pasbox', 'credentials')
+
+MAX_DURATION = 3600
+
+# botocore refreshes credentials 15 minutes before they expire, cached
+# credentials have to outlive that or every refresh would hand back the same
+# ones.
+REFRESH_MARGIN = 20 * 60
+
+# a session has to stay usable for a while after the refresh margin, or every
+# lookup and every request would go back to STS
+MIN_DURATION = REFRESH_MARGIN + 10 * 60
+
+SESSION_NAME = 'deploy'
+
+
+def path(directory, role_arn, source_key):
+    digest = hashlib.sha256(
+        (role_arn + '|' + SESSION_NAME + '|' + source_key).encode(
+            'utf-8')).hexdigest()
+
+    return os.path.join(directory, digest[:32] + '.json')
+
+
+def fresh(cached):
+    if not cached:
+        return False
+
+    expiry = datetime.datetime.fromisoformat(cached['expiry_time'])
+    remaining = expiry - datetime.datetime.now(datetime.timezone.utc)
+
+    return remaining.total_seconds() > REFRESH_MARGIN
+
+
+def read(cache_path):
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write(cache_path, cached):
+    temporary = cache_path + '.' + str(os.getpid()) + '.tmp'
+
+    with open(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+              'w') as f:
+        json.dump(cached, f)
+
+    os.replace(temporary, cache_path)
+
+
+def assume(sts_client, role_arn, duration, cache_path):
+    if duration < MIN_DURATION or duration > MAX_DURATION:
+        raise ValueError('session duration must be between ' +
+                         str(MIN_DURATION) + ' and ' + str(MAX_DURATION) +
+                         ' seconds, got ' + repr(duration))
+
+    os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+
+    with open(cache_path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        try:
+            cached = read(cache_path)
+
+            if fresh(cached):
+                return cached
+
+            print(">>> assuming " + role_arn, flush=True)
+
+            assumed = sts_client.assume_role(
+                RoleArn=role_arn,
+                RoleSessionName=SESSION_NAME,
+                DurationSeconds=duration)['Credentials']
+
+            cached = dict(
+                access_key=assumed['AccessKeyId'],
+                secret_key=assumed['SecretAccessKey'],
+                token=assumed['SessionToken'],
+                expiry_time=assumed['Expiration'].astimezone(
+                    datetime.timezone.utc).isoformat())
+
+            write(cache_path, cached)
+
+            return cached
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def session(source, sts_client, role_arn, duration, directory):
+    import boto3.session
+    import botocore.credentials
+    import botocore.session
+
+    cache_path = path(directory, role_arn,
+                      source.get_credentials().access_key)
+
+    credentials = botocore.credentials.RefreshableCredentials.create_from_metadata(
+        metadata=assume(sts_client, role_arn, duration, cache_path),
+        refresh_using=lambda: assume(sts_client, role_arn, duration,
+                                     cache_path),
+        method='assume-role')
+
+    class Provider(botocore.credentials.CredentialProvider):
+        METHOD = 'assume-role'
+
+        def load(self):
+            return credentials
+
+    core = botocore.session.get_session()
+    core.register_component(
+        'credential_provider',
+        botocore.credentials.CredentialResolver(providers=[Provider()]))
+
+    return boto3.session.Session(
+        botocore_session=core, region_name=source.region_name)
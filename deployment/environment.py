@@ -0,0 +1,28 @@
+import os
+
+VARIABLE = 'PASBOX_ENVIRONMENT'
+DEFAULT = 'production'
+NAMES = ['development', 'production']
+
+
+def name():
+    selected = os.environ.get(VARIABLE, DEFAULT)
+
+    if selected not in NAMES:
+        raise ValueError('unknown environment ' + repr(selected) +
+                         ', expected one of ' + ', '.join(NAMES))
+
+    return selected
+
+
+def select(settings):
+    unknown = sorted(set(settings) - set(NAMES + ['default']))
+
+    if unknown:
+        raise ValueError('settings for unknown environments: ' +
+                         ', '.join(unknown))
+
+    selected = dict(settings.get('default', dict()))
+    selected.update(settings.get(name(), dict()))
+
+    return selected
@@ -0,0 +1,107 @@
+import time
+
+FIRST_DELAY = 1
+MAX_DELAY = 10
+BACKOFF = 1.5
+
+
+def delays():
+    delay = FIRST_DELAY
+
+    while True:
+        reset = yield delay
+
+        if reset:
+            delay = FIRST_DELAY
+        else:
+            delay = min(delay * BACKOFF, MAX_DELAY)
+
+
+def wait_for_change_set(cloudformation_client, stack_name, change_set_name):
+    backoff = delays()
+    delay = next(backoff)
+
+    while True:
+        description = cloudformation_client.describe_change_set(
+            StackName=stack_name, ChangeSetName=change_set_name)
+
+        if description['Status'] in ['CREATE_COMPLETE', 'FAILED']:
+            return description
+
+        time.sleep(delay)
+        delay = backoff.send(False)
+
+
+def no_changes(description):
+    reason = description.get('StatusReason', '')
+
+    return 'FAILED' == description['Status'] and (
+        "didn't contain changes" in reason or 'No updates' in reason)
+
+
+def finished(event):
+    return 'AWS::CloudFormation::Stack' == event['ResourceType'] and \
+        event['LogicalResourceId'] == event['StackName'] and \
+        not event['ResourceStatus'].endswith('_IN_PROGRESS')
+
+
+def succeeded(status):
+    return status.endswith('_COMPLETE') and 'ROLLBACK' not in status
+
+
+def new_events(cloudformation_client, stack_name, token, seen):
+    events = []
+    paginator = cloudformation_client.get_paginator('describe_stack_events')
+
+    for page in paginator.paginate(StackName=stack_name):
+        for event in page['StackEvents']:
+            if event['EventId'] in seen:
+                return list(reversed(events))
+
+            if token == event.get('ClientRequestToken'):
+                events.append(event)
+
+        if page['StackEvents'] and \
+                token != page['StackEvents'][-1].get('ClientRequestToken'):
+            break
+
+    return list(reversed(events))
+
+
+def tail(cloudformation_client, stack_name, token, log):
+    backoff = delays()
+    next(backoff)
+
+    seen = set()
+    resources = dict()
+
+    while True:
+        events = new_events(cloudformation_client, stack_name, token, seen)
+
+        for event in events:
+            seen.add(event['EventId'])
+
+            if finished(event):
+                log(stack_name, "stack " + event['ResourceStatus'])
+                return event['ResourceStatus']
+
+            if stack_name != event['LogicalResourceId']:
+                resources[event['LogicalResourceId']] = event['ResourceStatus']
+
+            message = event['LogicalResourceId'] + " (" + \
+                event['ResourceType'] + ") " + event['ResourceStatus']
+
+            if event.get('ResourceStatusReason'):
+                message += ": " + event['ResourceStatusReason']
+
+            log(stack_name, message)
+
+        if events:
+            done = len([
+                status for status in resources.values()
+                if not status.endswith('_IN_PROGRESS')
+            ])
+            log(stack_name, "{} of {} resources settled".format(
+                done, len(resources)))
+
+        time.sleep(backoff.send(bool(events)))
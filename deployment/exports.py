@@ -0,0 +1,73 @@
+import difflib
+import json
+import threading
+
+from deployment import aws, graph
+
+ARTIFACTS_BUCKET = 'ArtifactsBucket'
+
+lock = threading.Lock()
+cache = dict()
+
+
+def fetch(cloudformation_client):
+    found = dict()
+
+    for page in cloudformation_client.get_paginator('list_exports').paginate():
+        for export in page.get('Exports', []):
+            found[export['Name']] = export['Value']
+
+    return found
+
+
+def target(args):
+    return (args.account, args.region)
+
+
+def resolve(args):
+    with lock:
+        if target(args) not in cache:
+            cache[target(args)] = fetch(
+                aws.client('cloudformation', args.region, args.account))
+
+        return cache[target(args)]
+
+
+def invalidate(args):
+    with lock:
+        cache.pop(target(args), None)
+
+
+def missing(name, known):
+    message = "export '" + name + "' does not exist"
+    close = difflib.get_close_matches(name, known, n=3)
+
+    if close:
+        message += ", did you mean " + ", ".join(close) + "?"
+
+    return message
+
+
+def bucket(args):
+    found = resolve(args)
+
+    if ARTIFACTS_BUCKET in found:
+        return found[ARTIFACTS_BUCKET]
+
+    # root stacks deployed before the export existed still have the bucket,
+    # under the name root gives it
+    return 'artifacts-' + args.region + '-' + args.account
+
+
+def check(args, body, pending):
+    found = resolve(args)
+    known = set(found) | set(pending)
+
+    errors = [
+        missing(name, known)
+        for name in sorted(set(graph.imports(json.loads(body))))
+        if name not in known
+    ]
+
+    if errors:
+        raise ValueError('; '.join(errors))
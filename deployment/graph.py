@@ -0,0 +1,118 @@
+import concurrent.futures
+
+
+def exports(template):
+    names = []
+
+    for output in template.to_dict().get('Outputs', {}).values():
+        name = output.get('Export', {}).get('Name')
+
+        if isinstance(name, str):
+            names.append(name)
+
+    return names
+
+
+def imports(value):
+    names = []
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if 'Fn::ImportValue' == key and isinstance(item, str):
+                names.append(item)
+            else:
+                names.extend(imports(item))
+    elif isinstance(value, list):
+        for item in value:
+            names.extend(imports(item))
+
+    return names
+
+
+def dependencies(modules):
+    exporters = dict()
+
+    for name, mod in modules.items():
+        for export in exports(getattr(mod, 'template')):
+            exporters[export] = name
+
+    graph = dict()
+
+    for name, mod in modules.items():
+        depends_on = set()
+
+        for dependency in getattr(mod, 'dependencies', []):
+            if dependency in modules:
+                depends_on.add(dependency)
+
+        for imported in imports(getattr(mod, 'template').to_dict()):
+            if imported in exporters and name != exporters[imported]:
+                depends_on.add(exporters[imported])
+
+        graph[name] = depends_on
+
+    return graph
+
+
+def order(graph):
+    ordered = []
+    remaining = dict((name, set(depends_on))
+                     for name, depends_on in graph.items())
+
+    while remaining:
+        ready = sorted(name for name, depends_on in remaining.items()
+                       if not depends_on)
+
+        if not ready:
+            raise ValueError('dependency cycle between stacks: ' +
+                             ', '.join(sorted(remaining.keys())))
+
+        for name in ready:
+            ordered.append(name)
+            del remaining[name]
+
+        for depends_on in remaining.values():
+            depends_on.difference_update(ready)
+
+    return ordered
+
+
+def run(graph, fn, parallelism=4):
+    order(graph)
+
+    results = dict()
+    pending = dict()
+    waiting = set(graph.keys())
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=parallelism) as executor:
+        while waiting or pending:
+            for name in sorted(waiting):
+                depends_on = graph[name]
+
+                if any(dependency in results and results[dependency] is not True
+                       for dependency in depends_on):
+                    results[name] = None
+                    waiting.discard(name)
+                elif all(results.get(dependency) is True
+                         for dependency in depends_on):
+                    pending[executor.submit(fn, name)] = name
+                    waiting.discard(name)
+
+            if not pending:
+                continue
+
+            done, _ = concurrent.futures.wait(
+                pending.keys(),
+                return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+
+                try:
+                    future.result()
+                    results[name] = True
+                except BaseException as e:
+                    results[name] = e
+
+    return results
@@ -0,0 +1,49 @@
+import fnmatch
+import os
+import os.path
+import zipfile
+
+from deployment import artifacts, slim
+
+# the Java runtimes put every jar in /opt/java/lib of a layer on the classpath
+JAVA_LIB = 'java/lib/'
+
+
+def dependency(name, project):
+    return name.startswith('lib/') and name.endswith('.jar') and \
+        not any(fnmatch.fnmatchcase(name, pattern) for pattern in project)
+
+
+def split(name, source, function_target, layer_target, project):
+    moved = 0
+
+    with zipfile.ZipFile(source) as archive, \
+            zipfile.ZipFile(function_target + '.tmp', 'w') as function, \
+            zipfile.ZipFile(layer_target + '.tmp', 'w') as layer:
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            if info.is_dir():
+                continue
+
+            data = archive.read(info.filename)
+
+            if dependency(info.filename, project):
+                slim.write(layer, JAVA_LIB + info.filename[len('lib/'):], data)
+                moved += 1
+            else:
+                slim.write(function, info.filename, data)
+
+    os.replace(function_target + '.tmp', function_target)
+    os.replace(layer_target + '.tmp', layer_target)
+
+    print(">>> [" + name + "] moved {} dependency jars to a {:.2f} MB layer, "
+          "function is {:.2f} MB".format(
+              moved, os.path.getsize(layer_target) / artifacts.MB,
+              os.path.getsize(function_target) / artifacts.MB))
+
+    return layer_target
+
+
+def key(prefix, layer_path):
+    # layer zips are written deterministically, so their digest only changes
+    # with the set of dependency jars
+    return prefix + '-' + artifacts.sha256(layer_path)[:16] + '.zip'
@@ -0,0 +1,547 @@
+import argparse
+import collections
+import datetime
+import hashlib
+import os
+import sys
+import threading
+import uuid
+
+from deployment import aws, phases, templates
+
+REGION = 'us-east-1'
+ACCOUNT = '000000000000'
+PAGE_SIZE = 100
+
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def error(status, code, message):
+    return status, dict(Error=dict(Code=code, Message=message))
+
+
+def read(body):
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+
+    if isinstance(body, str):
+        return body.encode('utf-8')
+
+    if hasattr(body, 'seek'):
+        body.seek(0)
+
+    return body.read()
+
+
+def page(items, token, key):
+    start = int(token or 0)
+    response = dict()
+    response[key] = items[start:start + PAGE_SIZE]
+
+    if start + PAGE_SIZE < len(items):
+        response['NextToken'] = str(start + PAGE_SIZE)
+
+    return response
+
+
+class CloudFormation:
+    def __init__(self, s3):
+        self.stacks = collections.OrderedDict()
+        self.s3 = s3
+
+    def stack_id(self, name):
+        return 'arn:aws:cloudformation:' + REGION + ':' + ACCOUNT + \
+            ':stack/' + name + '/' + str(uuid.uuid4())
+
+    def add_stack(self, name, body='{}', status='CREATE_COMPLETE'):
+        self.stacks[name] = dict(
+            StackName=name,
+            StackId=self.stack_id(name),
+            StackStatus=status,
+            CreationTime=now(),
+            Parameters=[],
+            Outputs=[],
+            TemplateBody=body,
+            Events=[],
+            ChangeSets=dict())
+
+        return self.stacks[name]
+
+    def missing(self, name):
+        return error(400, 'ValidationError',
+                     'Stack with id ' + name + ' does not exist')
+
+    def describe(self, stack):
+        return dict(
+            (key, value) for key, value in stack.items()
+            if key not in ['TemplateBody', 'Events', 'ChangeSets'])
+
+    def DescribeStacks(self, params):
+        if params.get('StackName'):
+            if params['StackName'] not in self.stacks:
+                return self.missing(params['StackName'])
+
+            return 200, dict(
+                Stacks=[self.describe(self.stacks[params['StackName']])])
+
+        return 200, page([
+            self.describe(stack) for stack in self.stacks.values()
+            if 'DELETE_COMPLETE' != stack['StackStatus']
+        ], params.get('NextToken'), 'Stacks')
+
+    def GetTemplate(self, params):
+        if params['StackName'] not in self.stacks:
+            return self.missing(params['StackName'])
+
+        return 200, dict(
+            TemplateBody=self.stacks[params['StackName']]['TemplateBody'])
+
+    def CreateChangeSet(self, params):
+        name = params['StackName']
+
+        if 'CREATE' == params.get('ChangeSetType'):
+            stack = self.add_stack(name, status='REVIEW_IN_PROGRESS')
+        elif name not in self.stacks:
+            return self.missing(name)
+        else:
+            stack = self.stacks[name]
+
+        body = params.get('TemplateBody')
+
+        if 'TemplateURL' in params:
+            body = self.s3.fetch(params['TemplateURL'])
+
+        if body is None:
+            return error(400, 'ValidationError',
+                         'TemplateBody or a TemplateURL of a stored object '
+                         'is required')
+
+        previous = templates.normalize(stack['TemplateBody'])
+        current = templates.normalize(body)
+
+        changes = []
+        for logical_id, resource in current.get('Resources', {}).items():
+            if logical_id not in previous.get('Resources', {}):
+                action = 'Add'
+            elif resource != previous['Resources'][logical_id]:
+                action = 'Modify'
+            else:
+                continue
+
+            changes.append((action, logical_id, resource['Type']))
+
+        for logical_id, resource in previous.get('Resources', {}).items():
+            if logical_id not in current.get('Resources', {}):
+                changes.append(('Remove', logical_id, resource['Type']))
+
+        parameters = params.get('Parameters', [])
+        unchanged = not changes and \
+            templates.normalize_parameters(previous, stack['Parameters']) == \
+            templates.normalize_parameters(current, parameters)
+
+        change_set_id = 'arn:aws:cloudformation:' + REGION + ':' + ACCOUNT + \
+            ':changeSet/' + params['ChangeSetName'] + '/' + str(uuid.uuid4())
+
+        stack['ChangeSets'][params['ChangeSetName']] = dict(
+            ChangeSetId=change_set_id,
+            ChangeSetName=params['ChangeSetName'],
+            StackId=stack['StackId'],
+            StackName=name,
+            Status='FAILED' if unchanged else 'CREATE_COMPLETE',
+            StatusReason="The submitted information didn't contain changes. "
+            "Submit different information to create a change set."
+            if unchanged else '',
+            ExecutionStatus='UNAVAILABLE' if unchanged else 'AVAILABLE',
+            CreationTime=now(),
+            Parameters=parameters,
+            TemplateBody=body,
+            Changes=[
+                dict(
+                    Type='Resource',
+                    ResourceChange=dict(
+                        Action=action,
+                        LogicalResourceId=logical_id,
+                        ResourceType=resource_type))
+                for action, logical_id, resource_type in changes
+            ])
+
+        return 200, dict(Id=change_set_id, StackId=stack['StackId'])
+
+    def change_set(self, params):
+        stack = self.stacks.get(params['StackName'])
+
+        if not stack or params['ChangeSetName'] not in stack['ChangeSets']:
+            return None
+
+        return stack['ChangeSets'][params['ChangeSetName']]
+
+    def DescribeChangeSet(self, params):
+        change_set = self.change_set(params)
+
+        if not change_set:
+            return error(404, 'ChangeSetNotFound',
+                         'ChangeSet ' + params['ChangeSetName'] +
+                         ' does not exist')
+
+        return 200, dict((key, value) for key, value in change_set.items()
+                         if 'TemplateBody' != key)
+
+    def DeleteChangeSet(self, params):
+        if not self.change_set(params):
+            return error(404, 'ChangeSetNotFound',
+                         'ChangeSet ' + params['ChangeSetName'] +
+                         ' does not exist')
+
+        del self.stacks[params['StackName']]['ChangeSets'][
+            params['ChangeSetName']]
+
+        return 200, dict()
+
+    def event(self, stack, token, logical_id, resource_type, status):
+        stack['Events'].insert(
+            0,
+            dict(
+                EventId=str(uuid.uuid4()),
+                StackId=stack['StackId'],
+                StackName=stack['StackName'],
+                LogicalResourceId=logical_id,
+                PhysicalResourceId=logical_id,
+                ResourceType=resource_type,
+                ResourceStatus=status,
+                Timestamp=now(),
+                ClientRequestToken=token))
+
+    def ExecuteChangeSet(self, params):
+        change_set = self.change_set(params)
+
+        if not change_set or 'AVAILABLE' != change_set['ExecutionStatus']:
+            return error(400, 'InvalidChangeSetStatus',
+                         'ChangeSet cannot be executed')
+
+        stack = self.stacks[params['StackName']]
+        token = params.get('ClientRequestToken')
+        operation = 'CREATE' if 'REVIEW_IN_PROGRESS' == stack[
+            'StackStatus'] else 'UPDATE'
+
+        self.event(stack, token, stack['StackName'],
+                   'AWS::CloudFormation::Stack', operation + '_IN_PROGRESS')
+
+        for change in change_set['Changes']:
+            resource = change['ResourceChange']
+            verb = dict(Add='CREATE', Modify='UPDATE',
+                        Remove='DELETE')[resource['Action']]
+
+            self.event(stack, token, resource['LogicalResourceId'],
+                       resource['ResourceType'], verb + '_IN_PROGRESS')
+            self.event(stack, token, resource['LogicalResourceId'],
+                       resource['ResourceType'], verb + '_COMPLETE')
+
+        self.event(stack, token, stack['StackName'],
+                   'AWS::CloudFormation::Stack', operation + '_COMPLETE')
+
+        template = templates.normalize(change_set['TemplateBody'])
+
+        stack['StackStatus'] = operation + '_COMPLETE'
+        stack['TemplateBody'] = change_set['TemplateBody']
+        stack['Parameters'] = change_set['Parameters']
+        stack['Outputs'] = []
+
+        for key, output in template.get('Outputs', {}).items():
+            item = dict(OutputKey=key, OutputValue='offline-' + key)
+
+            if isinstance(output.get('Export', {}).get('Name'), str):
+                item['ExportName'] = output['Export']['Name']
+
+            stack['Outputs'].append(item)
+
+        change_set['ExecutionStatus'] = 'EXECUTE_COMPLETE'
+
+        return 200, dict()
+
+    def DescribeStackEvents(self, params):
+        if params['StackName'] not in self.stacks:
+            return self.missing(params['StackName'])
+
+        return 200, page(self.stacks[params['StackName']]['Events'],
+                         params.get('NextToken'), 'StackEvents')
+
+    def ListExports(self, params):
+        exports = []
+
+        for stack in self.stacks.values():
+            for output in stack['Outputs']:
+                if 'ExportName' in output:
+                    exports.append(
+                        dict(
+                            ExportingStackId=stack['StackId'],
+                            Name=output['ExportName'],
+                            Value=output['OutputValue']))
+
+        return 200, page(exports, params.get('NextToken'), 'Exports')
+
+
+class S3:
+    def __init__(self):
+        self.objects = dict()
+        self.uploads = dict()
+
+    def store(self, bucket, key, body, metadata):
+        version = dict(
+            VersionId=uuid.uuid4().hex,
+            Body=body,
+            Metadata=metadata or dict(),
+            ETag='"' + hashlib.md5(body).hexdigest() + '"',
+            LastModified=now())
+
+        self.objects.setdefault((bucket, key), []).append(version)
+
+        return version
+
+    def fetch(self, url):
+        host, key = url.split('://', 1)[1].split('/', 1)
+        versions = self.objects.get((host.split('.s3.', 1)[0], key))
+
+        if not versions:
+            return None
+
+        return versions[-1]['Body'].decode('utf-8')
+
+    def HeadObject(self, params):
+        versions = self.objects.get((params['Bucket'], params['Key']))
+
+        if not versions:
+            return error(404, '404', 'Not Found')
+
+        latest = versions[-1]
+
+        return 200, dict(
+            VersionId=latest['VersionId'],
+            ETag=latest['ETag'],
+            Metadata=latest['Metadata'],
+            ContentLength=len(latest['Body']),
+            LastModified=latest['LastModified'])
+
+    def PutObject(self, params):
+        version = self.store(params['Bucket'], params['Key'],
+                             read(params.get('Body', b'')),
+                             params.get('Metadata'))
+
+        return 200, dict(VersionId=version['VersionId'], ETag=version['ETag'])
+
+    def CreateMultipartUpload(self, params):
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = dict(
+            Bucket=params['Bucket'],
+            Key=params['Key'],
+            Metadata=params.get('Metadata'),
+            Parts=dict())
+
+        return 200, dict(
+            Bucket=params['Bucket'], Key=params['Key'], UploadId=upload_id)
+
+    def UploadPart(self, params):
+        upload = self.uploads.get(params['UploadId'])
+
+        if not upload:
+            return error(404, 'NoSuchUpload', 'The upload does not exist')
+
+        body = read(params['Body'])
+        upload['Parts'][params['PartNumber']] = body
+
+        return 200, dict(ETag='"' + hashlib.md5(body).hexdigest() + '"')
+
+    def CompleteMultipartUpload(self, params):
+        upload = self.uploads.pop(params['UploadId'], None)
+
+        if not upload:
+            return error(404, 'NoSuchUpload', 'The upload does not exist')
+
+        body = b''.join(
+            upload['Parts'][part['PartNumber']]
+            for part in sorted(
+                params['MultipartUpload']['Parts'],
+                key=lambda part: part['PartNumber']))
+
+        version = self.store(upload['Bucket'], upload['Key'], body,
+                             upload['Metadata'])
+
+        return 200, dict(
+            Bucket=upload['Bucket'],
+            Key=upload['Key'],
+            VersionId=version['VersionId'],
+            ETag=version['ETag'])
+
+    def AbortMultipartUpload(self, params):
+        self.uploads.pop(params['UploadId'], None)
+
+        return 204, dict()
+
+
+class STS:
+    def AssumeRole(self, params):
+        return 200, dict(
+            Credentials=dict(
+                AccessKeyId='offline-' + params['RoleArn'].split(':')[4],
+                SecretAccessKey='offline',
+                SessionToken='offline',
+                Expiration=now() + datetime.timedelta(
+                    seconds=params.get('DurationSeconds', 3600))),
+            AssumedRoleUser=dict(
+                AssumedRoleId='offline:' + params['RoleSessionName'],
+                Arn=params['RoleArn'] + '/' + params['RoleSessionName']))
+
+
+class Harness:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.regions = dict()
+        self.calls = []
+
+    def services(self, region, account=ACCOUNT):
+        if (account, region) not in self.regions:
+            s3 = S3()
+            self.regions[(account, region)] = dict(
+                cloudformation=CloudFormation(s3), s3=s3, sts=STS())
+
+        return self.regions[(account, region)]
+
+    def record(self, model, params, context, **kwargs):
+        context['offline_params'] = params
+
+        with self.lock:
+            self.calls.append((phases.current() or 'unattributed',
+                               model.service_model.service_name, model.name))
+
+    def respond(self, model, context, request_signer=None, **kwargs):
+        from botocore.awsrequest import AWSResponse
+
+        region = context.get('client_region') or REGION
+        account = ACCOUNT
+
+        # credentials handed out by the STS stand-in carry their account
+        signing = getattr(request_signer, '_credentials', None)
+        if signing and signing.access_key.startswith('offline-'):
+            account = signing.access_key[len('offline-'):]
+
+        with self.lock:
+            service = self.services(region, account).get(
+                model.service_model.service_name)
+
+        handler = getattr(service, model.name, None)
+
+        if handler is None:
+            status, parsed = error(
+                400, 'NotImplemented', 'the offline stand-in does not support ' +
+                model.service_model.service_name + ':' + model.name)
+        else:
+            with self.lock:
+                status, parsed = handler(context['offline_params'])
+
+        parsed['ResponseMetadata'] = dict(
+            RequestId=uuid.uuid4().hex,
+            HTTPStatusCode=status,
+            HTTPHeaders=dict(),
+            RetryAttempts=0)
+
+        return AWSResponse('https://offline', status, dict(), None), parsed
+
+    def install(self):
+        aws.options.update(
+            region_name=REGION,
+            aws_access_key_id='offline',
+            aws_secret_access_key='offline')
+        aws.handlers.append(('before-parameter-build', self.record))
+        aws.handlers.append(('before-call', self.respond))
+
+    def report(self):
+        by_phase = collections.OrderedDict()
+
+        for phase, service, operation in self.calls:
+            by_phase.setdefault(phase, collections.Counter())[service + ':' +
+                                                             operation] += 1
+
+        print(">>> AWS API calls by phase")
+
+        for phase, counter in by_phase.items():
+            print("{:<40} {:>5}".format(phase, sum(counter.values())))
+
+            for operation, count in sorted(counter.items()):
+                print("    {:<36} {:>5}".format(operation, count))
+
+        print("{:<40} {:>5}".format('total', len(self.calls)))
+
+
+parser = argparse.ArgumentParser(
+    description='Run deploy.py against local stand-ins for CloudFormation '
+    'and S3 and count the AWS API calls it makes.',
+    epilog='Arguments after -- are passed to deploy.py, --region and '
+    '--account are filled in when missing.')
+parser.add_argument(
+    '--existing-stacks',
+    type=int,
+    dest='existing_stacks',
+    required=False,
+    default=0,
+    help='how many unrelated stacks the stand-in account already has')
+parser.add_argument(
+    '--runs',
+    type=int,
+    dest='runs',
+    required=False,
+    default=1,
+    help='how many times to deploy against the same stand-in account')
+parser.add_argument(
+    '--max-calls',
+    type=int,
+    dest='max_calls',
+    required=False,
+    default=None,
+    help='exit with 1 when the last run makes more AWS API calls than this')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if '--' in argv:
+        own, deploy_argv = argv[:argv.index('--')], argv[argv.index('--') + 1:]
+    else:
+        own, deploy_argv = argv, []
+
+    args = parser.parse_args(own)
+
+    if '--region' not in deploy_argv:
+        deploy_argv += ['--region', REGION]
+
+    if '--account' not in deploy_argv:
+        deploy_argv += ['--account', ACCOUNT]
+
+    sys.path.insert(0, os.getcwd())
+    import deploy
+
+    harness = Harness()
+    harness.install()
+
+    for index in range(args.existing_stacks):
+        harness.services(REGION)['cloudformation'].add_stack(
+            'unrelated-' + str(index))
+
+    for run in range(args.runs):
+        harness.calls = []
+
+        print(">>> offline run " + str(run + 1))
+
+        try:
+            deploy.main(deploy_argv)
+        finally:
+            harness.report()
+
+    if args.max_calls is not None and len(harness.calls) > args.max_calls:
+        print(">>> {} AWS API calls, over the budget of {}".format(
+            len(harness.calls), args.max_calls))
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import concurrent.futures
+import contextlib
+import contextvars
+
+# a context variable rather than a thread local, so work handed to another
+# thread can carry its phase along through contextvars.copy_context()
+stack = contextvars.ContextVar('phases', default=())
+
+listeners = []
+
+
+def current():
+    names = stack.get()
+
+    if names:
+        return names[-1]
+
+    return None
+
+
+@contextlib.contextmanager
+def phase(name):
+    token = stack.set(stack.get() + (name, ))
+
+    for listener in listeners:
+        listener('enter', name)
+
+    try:
+        yield
+    finally:
+        for listener in listeners:
+            listener('exit', name)
+
+        stack.reset(token)
+
+
+class Executor(concurrent.futures.ThreadPoolExecutor):
+    # runs each task in a copy of the submitting thread's context, for pools
+    # owned by libraries such as s3transfer
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args,
+                              **kwargs)
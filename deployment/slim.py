@@ -0,0 +1,148 @@
+import fnmatch
+import io
+import os
+import os.path
+import zipfile
+
+from deployment import artifacts
+
+SIGNATURES = ['META-INF/*.SF', 'META-INF/*.RSA', 'META-INF/*.DSA',
+              'META-INF/*.EC', 'META-INF/SIG-*']
+
+DOCS = ['META-INF/LICENSE*', 'META-INF/NOTICE*', 'META-INF/DEPENDENCIES*',
+        'META-INF/README*', 'META-INF/maven/*', '*.html', '*.md']
+
+# fixed timestamps keep the slimmed zip byte for byte the same between runs,
+# so an unchanged build reuses the artifact version already in S3
+DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def rules(strip=None, drop=None, keep_signed=None):
+    return dict(
+        strip=SIGNATURES + DOCS if strip is None else strip,
+        drop=drop or [],
+        keep_signed=keep_signed or [])
+
+
+def matches(name, patterns):
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def group(name):
+    if name.startswith('lib/') and name.endswith('.jar'):
+        return name
+
+    return '(project)'
+
+
+def inventory(path):
+    groups = dict()
+
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            item = groups.setdefault(
+                group(info.filename),
+                dict(name=group(info.filename), size=0, uncompressed=0,
+                     classes=0))
+            item['size'] += info.compress_size
+            item['uncompressed'] += info.file_size
+
+            if info.filename.endswith('.class'):
+                item['classes'] += 1
+            elif info.filename.endswith('.jar'):
+                with zipfile.ZipFile(io.BytesIO(
+                        archive.read(info.filename))) as jar:
+                    item['classes'] += sum(
+                        1 for name in jar.namelist() if name.endswith('.class'))
+
+    return sorted(groups.values(), key=lambda item: item['size'], reverse=True)
+
+
+def report(name, items, top=10):
+    total = sum(item['size'] for item in items)
+
+    print(">>> [" + name + "] biggest contributors of {:.1f} MB:".format(
+        total / artifacts.MB))
+
+    for item in items[:top]:
+        print("    {:<50} {:>8.2f} MB {:>5.1f}% {:>7} classes".format(
+            item['name'], item['size'] / artifacts.MB,
+            100.0 * item['size'] / total if total else 0, item['classes']))
+
+
+def write(archive, name, data):
+    info = zipfile.ZipInfo(name, DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+
+    archive.writestr(info, data, compresslevel=9)
+
+
+def slim_jar(data, strip):
+    output = io.BytesIO()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as jar, \
+            zipfile.ZipFile(output, 'w') as slimmed:
+        for info in jar.infolist():
+            if not info.is_dir() and not matches(info.filename, strip):
+                write(slimmed, info.filename, jar.read(info.filename))
+
+    return output.getvalue()
+
+
+def slim(source, target, settings):
+    stripped = []
+    dropped = []
+
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    temporary = target + '.tmp'
+
+    with zipfile.ZipFile(source) as archive, \
+            zipfile.ZipFile(temporary, 'w') as slimmed:
+        for info in archive.infolist():
+            name = info.filename
+
+            if info.is_dir():
+                continue
+
+            if matches(name, settings['drop']):
+                dropped.append(name)
+                continue
+
+            if matches(name, settings['strip']):
+                stripped.append(name)
+                continue
+
+            data = archive.read(name)
+
+            # signed providers such as BouncyCastle stop loading through JCE
+            # once their signature files are gone, they are copied untouched
+            if name.endswith('.jar') and \
+                    not matches(name, settings['keep_signed']):
+                data = slim_jar(data, settings['strip'])
+
+            write(slimmed, name, data)
+
+    os.replace(temporary, target)
+
+    return dropped, stripped
+
+
+def run(name, source, target, settings):
+    before = os.path.getsize(source)
+
+    report(name, inventory(source))
+
+    dropped, _ = slim(source, target, settings)
+
+    for path in dropped:
+        print(">>> [" + name + "] dropped " + path)
+
+    after = os.path.getsize(target)
+
+    print(">>> [" + name + "] slimmed {:.2f} MB to {:.2f} MB ({:.1f}% "
+          "smaller)".format(before / artifacts.MB, after / artifacts.MB,
+                            100.0 * (before - after) / before
+                            if before else 0))
+
+    return target
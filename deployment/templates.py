@@ -0,0 +1,154 @@
+import hashlib
+import json
+
+INLINE_LIMIT = 51200
+URL_LIMIT = 1048576
+
+POLICY_KEYS = ['Effect', 'Action', 'NotAction', 'Resource', 'NotResource',
+               'Condition']
+
+
+def normalize(body):
+    from cfn_tools import load_yaml
+
+    if isinstance(body, str):
+        body = load_yaml(body)
+
+    return json.loads(json.dumps(body, sort_keys=True, default=str))
+
+
+def normalize_parameters(template_body, parameters):
+    values = dict()
+
+    for key, declaration in template_body.get('Parameters', {}).items():
+        if 'Default' in declaration:
+            values[key] = str(declaration['Default'])
+
+    for parameter in parameters or []:
+        values[parameter['ParameterKey']] = parameter.get('ParameterValue')
+
+    return values
+
+
+def as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def merge_principals(principal, other):
+    merged = dict()
+
+    for kind in list(principal) + [key for key in other if key not in principal]:
+        values = []
+        seen = set()
+
+        for value in as_list(principal.get(kind, [])) + \
+                as_list(other.get(kind, [])):
+            key = json.dumps(value, sort_keys=True)
+
+            if key not in seen:
+                seen.add(key)
+                values.append(value)
+
+        merged[kind] = values[0] if 1 == len(values) else values
+
+    return merged
+
+
+def compact_statements(statements):
+    compacted = []
+    groups = dict()
+
+    for statement in statements:
+        mergeable = isinstance(statement, dict) and \
+            'Sid' not in statement and 'NotPrincipal' not in statement and \
+            isinstance(statement.get('Principal', {}), dict)
+
+        if not mergeable:
+            compacted.append(statement)
+            continue
+
+        key = json.dumps([statement.get(name) for name in POLICY_KEYS],
+                         sort_keys=True)
+
+        if key not in groups:
+            groups[key] = dict(statement)
+            compacted.append(groups[key])
+        elif 'Principal' in statement and 'Principal' in groups[key]:
+            groups[key]['Principal'] = merge_principals(
+                groups[key]['Principal'], statement['Principal'])
+        elif ('Principal' in statement) != ('Principal' in groups[key]):
+            compacted.append(statement)
+
+    return compacted
+
+
+def compact(value):
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    compacted = dict((key, compact(item)) for key, item in value.items())
+
+    if isinstance(compacted.get('Statement'), list):
+        compacted['Statement'] = compact_statements(compacted['Statement'])
+
+    return compacted
+
+
+def serialize(template):
+    return json.dumps(
+        compact(json.loads(template.to_json())), separators=(',', ':'))
+
+
+def sizes(name, body, log):
+    size = len(body.encode('utf-8'))
+    limit = INLINE_LIMIT if size <= INLINE_LIMIT else URL_LIMIT
+
+    log(name, "template is {} bytes, {:.0%} of the {} byte {} limit".format(
+        size, size / limit, limit,
+        'inline' if INLINE_LIMIT == limit else 'S3'))
+
+    if size > URL_LIMIT:
+        raise ValueError(name + ' template is ' + str(size) +
+                         ' bytes, over the ' + str(URL_LIMIT) +
+                         ' byte limit for templates staged in S3')
+
+    return size
+
+
+def stage(s3_client, region, bucket, name, body):
+    data = body.encode('utf-8')
+    key = 'templates/' + name + '-' + hashlib.sha256(data).hexdigest() + \
+        '.json'
+
+    s3_client.put_object(
+        Bucket=bucket, Key=key, Body=data, ContentType='application/json')
+
+    return 'https://' + bucket + '.s3.' + region + '.amazonaws.com/' + key
+
+
+def arguments(s3_client, region, bucket, name, body, log):
+    if sizes(name, body, log) <= INLINE_LIMIT:
+        return dict(TemplateBody=body)
+
+    # the bucket is only looked up when a template has to be staged, the
+    # root stack creates it and is small enough to always go inline
+    url = stage(s3_client, region, bucket(), name, body)
+    log(name, "template is too large to pass inline, staged at " + url)
+
+    return dict(TemplateURL=url)
+
+
+def unchanged(cloudformation_client, stack, body, parameters):
+    deployed = normalize(
+        cloudformation_client.get_template(
+            StackName=stack.name, TemplateStage='Original')['TemplateBody'])
+    local = normalize(json.loads(body))
+
+    if deployed != local:
+        return False
+
+    return normalize_parameters(deployed, stack.parameters) == \
+        normalize_parameters(local, parameters)
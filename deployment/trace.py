@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+import time
+
+from deployment import phases
+
+lock = threading.Lock()
+started = dict()
+spans = []
+
+
+def listener(event, name):
+    key = (threading.get_ident(), name)
+    now = time.perf_counter()
+
+    with lock:
+        if 'enter' == event:
+            started[key] = now
+        elif key in started:
+            spans.append(
+                dict(
+                    name=name,
+                    thread=threading.current_thread().name,
+                    tid=threading.get_ident(),
+                    start=started.pop(key),
+                    end=now))
+
+
+def install():
+    phases.listeners.append(listener)
+
+
+def write(path):
+    with lock:
+        recorded = sorted(spans, key=lambda span: span['start'])
+
+    origin = recorded[0]['start'] if recorded else 0
+    events = []
+
+    for span in recorded:
+        events.append(
+            dict(
+                name=span['name'],
+                cat=span['name'].split('/')[0],
+                ph='X',
+                ts=int((span['start'] - origin) * 1e6),
+                dur=int((span['end'] - span['start']) * 1e6),
+                pid=os.getpid(),
+                tid=span['tid'],
+                args=dict(thread=span['thread'])))
+
+    with open(path, 'w') as f:
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f)
+
+    print(">>> wrote trace to " + path)
+
+
+def summary():
+    with lock:
+        recorded = sorted(spans, key=lambda span: span['start'])
+
+    if not recorded:
+        return
+
+    origin = recorded[0]['start']
+
+    print("{:<60} {:>10} {:>10}".format('phase', 'start', 'duration'))
+
+    for span in recorded:
+        print("{:<60} {:>9.2f}s {:>9.2f}s".format(
+            span['name'], span['start'] - origin, span['end'] - span['start']))
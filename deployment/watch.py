@@ -0,0 +1,118 @@
+import difflib
+import importlib
+import os
+import os.path
+import select
+import sys
+import time
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IGNORED = ['__pycache__', 'node_modules', 'build', '.gradle']
+
+
+def mtimes(name):
+    found = dict()
+
+    for directory, subdirectories, filenames in os.walk(os.path.join(
+            ROOT, name)):
+        subdirectories[:] = [
+            subdirectory for subdirectory in subdirectories
+            if subdirectory not in IGNORED
+        ]
+
+        for filename in filenames:
+            if filename.endswith('.py'):
+                path = os.path.join(directory, filename)
+                found[path] = os.stat(path).st_mtime_ns
+
+    return found
+
+
+def reload(name):
+    for loaded in [
+            module for module in sys.modules
+            if module == name or module.startswith(name + '.')
+    ]:
+        del sys.modules[loaded]
+
+    return importlib.import_module(name)
+
+
+def diff(name, previous, current):
+    lines = list(
+        difflib.unified_diff(
+            previous.splitlines(True), current.splitlines(True),
+            name + ' (before)', name + ' (now)'))
+
+    if lines:
+        sys.stdout.writelines(lines)
+    else:
+        print(">>> [" + name + "] template unchanged", flush=True)
+
+
+def wait(streams, interval):
+    if not streams:
+        time.sleep(interval)
+        return None
+
+    readable, _, _ = select.select(streams, [], [], interval)
+
+    if not readable:
+        return None
+
+    return readable[0].readline()
+
+
+def resynthesize(modules, sources, synthesized):
+    for name in modules:
+        current = mtimes(name)
+
+        if current == sources[name]:
+            continue
+
+        sources[name] = current
+        started = time.perf_counter()
+
+        try:
+            mod = reload(name)
+            template_yaml = mod.template.to_yaml()
+        except Exception:
+            traceback.print_exc()
+            print(">>> [" + name + "] keeping the last good template",
+                  flush=True)
+            continue
+
+        modules[name] = mod
+
+        print(">>> [" + name + "] synthesized in {:.0f}ms".format(
+            (time.perf_counter() - started) * 1000), flush=True)
+
+        diff(name, synthesized[name], template_yaml)
+        synthesized[name] = template_yaml
+
+
+def run(modules, interval, push):
+    sources = dict((name, mtimes(name)) for name in modules)
+    synthesized = dict(
+        (name, mod.template.to_yaml()) for name, mod in modules.items())
+    streams = [sys.stdin]
+
+    print(">>> watching " + ", ".join(modules) + ", press enter to push a "
+          "change set, ctrl-c to stop", flush=True)
+
+    try:
+        while True:
+            line = wait(streams, interval)
+
+            if '' == line:
+                print(">>> stdin closed, change sets can not be pushed "
+                      "anymore", flush=True)
+                streams = []
+            elif line is not None:
+                push(modules)
+
+            resynthesize(modules, sources, synthesized)
+    except KeyboardInterrupt:
+        print(">>> stopped watching", flush=True)
@@ -1,5 +1,97 @@
-from troposphere import Template
-from troposphere import sns
+import awacs
+import awacs.sqs
+
+from deployment import environment
+from troposphere import Template, Output, Export, Ref, GetAtt
+from troposphere import sns, sqs
+
+
+def validate(settings):
+    if settings['visibility_timeout'] < 0 or \
+            settings['visibility_timeout'] > 43200:
+        raise ValueError('visibility timeout must be between 0 and 43200 '
+                         'seconds, got ' + repr(settings['visibility_timeout']))
+
+    if settings['max_receive_count'] < 1:
+        raise ValueError('messages must be received at least once before '
+                         'they are dead-lettered, got ' +
+                         repr(settings['max_receive_count']))
+
+
+def topic_export(topic_name):
+    return ''.join(part.capitalize()
+                   for part in topic_name.split('-')) + 'TopicArn'
+
+
+def queue_export(topic_name):
+    return ''.join(part.capitalize()
+                   for part in topic_name.split('-')) + 'QueueArn'
+
+
+def buffer(template, topic, settings):
+    topic_name = topic.TopicName
+    name = topic.title[:-len('Topic')]
+
+    dead_letter_queue = template.add_resource(
+        sqs.Queue(
+            name + 'DeadLetterQueue',
+            QueueName=topic_name + '-dead-letter',
+            MessageRetentionPeriod=1209600))
+
+    queue = template.add_resource(
+        sqs.Queue(
+            name + 'Queue',
+            QueueName=topic_name,
+            VisibilityTimeout=settings['visibility_timeout'],
+            MessageRetentionPeriod=settings['retention'],
+            ReceiveMessageWaitTimeSeconds=20,
+            RedrivePolicy=sqs.RedrivePolicy(
+                deadLetterTargetArn=GetAtt(dead_letter_queue, "Arn"),
+                maxReceiveCount=settings['max_receive_count'])))
+
+    template.add_resource(
+        sqs.QueuePolicy(
+            name + 'QueuePolicy',
+            Queues=[Ref(queue)],
+            PolicyDocument=awacs.aws.PolicyDocument(
+                Version='2012-10-17',
+                Statement=[
+                    awacs.aws.Statement(
+                        Effect=awacs.aws.Allow,
+                        Action=[awacs.sqs.SendMessage],
+                        Principal=awacs.aws.Principal("Service",
+                                                      "sns.amazonaws.com"),
+                        Resource=[GetAtt(queue, "Arn")],
+                        Condition=awacs.aws.Condition(
+                            awacs.aws.ArnEquals('aws:SourceArn', Ref(topic))))
+                ])))
+
+    template.add_resource(
+        sns.SubscriptionResource(
+            name + 'QueueSubscription',
+            TopicArn=Ref(topic),
+            Protocol='sqs',
+            Endpoint=GetAtt(queue, "Arn"),
+            RawMessageDelivery=True))
+
+    template.add_output(
+        Output(
+            queue_export(topic_name),
+            Value=GetAtt(queue, "Arn"),
+            Export=Export(queue_export(topic_name))))
+
+    return queue
+
+
+buffering = environment.select(
+    dict(
+        default=dict(
+            topics=[],
+            visibility_timeout=180,
+            retention=345600,
+            max_receive_count=5)))
+
+validate(buffering)
 
 template = Template()
 
@@ -22,3 +114,20 @@ android_updated = template.add_resource(
 android_delivery_failed = template.add_resource(
     sns.Topic('AndroidDevicesDeliveryFailedTopic',
               TopicName='devices-android-delivery-failed'))
+
+for topic in [
+        android, android_created, android_deleted, android_updated,
+        android_delivery_failed
+]:
+    template.add_output(
+        Output(
+            topic_export(topic.TopicName),
+            Value=Ref(topic),
+            Export=Export(topic_export(topic.TopicName))))
+
+for topic in [
+        android_created, android_deleted, android_updated,
+        android_delivery_failed
+]:
+    if topic.TopicName in buffering['topics']:
+        buffer(template, topic, buffering)
@@ -4,6 +4,7 @@ from root import groups
 from root import roles
 from root import robots
 from root import artifacts
+from root import apigateway
 
 template = Template()
 
@@ -11,3 +12,4 @@ groups.generate(template)
 roles.generate(template)
 robots.generate(template)
 artifacts.generate(template)
+apigateway.generate(template)
@@ -0,0 +1,39 @@
+import awacs
+import awacs.sts
+
+from troposphere import Output, Export, GetAtt
+from troposphere import apigateway, iam
+
+CLOUDWATCH_ROLE_EXPORT = 'ApiGatewayCloudWatchRoleArn'
+
+
+def generate(template):
+    # API Gateway has a single CloudWatch role per account and region, it
+    # lives here so no API stack fights another one over it
+    role = template.add_resource(
+        iam.Role(
+            'ApiGatewayCloudWatchRole',
+            ManagedPolicyArns=[
+                "arn:aws:iam::aws:policy/service-role/AmazonAPIGatewayPushToCloudWatchLogs",
+            ],
+            AssumeRolePolicyDocument=awacs.aws.PolicyDocument(
+                Version='2012-10-17',
+                Statement=[
+                    awacs.aws.Statement(
+                        Effect=awacs.aws.Allow,
+                        Action=[awacs.sts.AssumeRole],
+                        Principal=awacs.aws.Principal(
+                            "Service", "apigateway.amazonaws.com"),
+                    )
+                ])))
+
+    template.add_resource(
+        apigateway.Account(
+            'ApiGatewayAccount', CloudWatchRoleArn=GetAtt(role, "Arn")))
+
+    template.add_output(
+        Output(
+            CLOUDWATCH_ROLE_EXPORT,
+            Description='Role API Gateway writes execution logs with.',
+            Value=GetAtt(role, "Arn"),
+            Export=Export(CLOUDWATCH_ROLE_EXPORT)))
@@ -5,7 +5,7 @@ import awacs.iam
 import awacs.s3
 import awacs.kms
 
-from troposphere import Template, Ref, Sub, GetAtt
+from troposphere import Template, Output, Export, Ref, Sub, GetAtt
 from troposphere import iam
 from troposphere import s3
 from troposphere import kms
@@ -130,3 +130,11 @@ def generate(template):
                         Sub("arn:aws:iam::${AWS::AccountId}:role/CloudFormationDeploy"
                             ))),
             ])))
+
+    template.add_output(
+        Output(
+            'ArtifactsBucket',
+            Description='Bucket that deploys upload artifacts and large '
+            'templates to.',
+            Value=Ref(artifacts_bucket),
+            Export=Export('ArtifactsBucket')))